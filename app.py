@@ -1,10 +1,25 @@
 import streamlit as st
-from src.rag_pipeline import create_or_load_vectorstore, get_qa_chain
-from src.pdf_loader import extract_text_from_pdf, extract_methods_section
-from src.gemini_wrapper import call_gemini
+from src.rag_pipeline import create_or_load_vectorstore, warm_up_embedder, collect_idle_sessions, AsyncQASession
+from src.namespaces import Namespace
+from src.pdf_loader import extract_methods_section
+from src.gemini_wrapper import call_gemini_stream
+from src.llm_client import STRONG_MODEL, get_llm_client
 import os
 from datetime import datetime
 
+# Load the embedding model in the background while the page renders
+warm_up_embedder()
+
+# Every browser session gets its own uploads folder and vector index
+if "namespace" not in st.session_state:
+    st.session_state["namespace"] = Namespace.create().name
+namespace = Namespace(st.session_state["namespace"])
+collect_idle_sessions()
+# Async QA for this session: answers are generated off the script thread
+if "qa_session" not in st.session_state:
+    st.session_state["qa_session"] = AsyncQASession(namespace.index_dir)
+qa_session = st.session_state["qa_session"]
+
 st.set_page_config(
     page_title="Research Pilot AI", 
     page_icon="�", 
@@ -608,13 +623,8 @@ with st.sidebar:
                     if key in st.session_state:
                         st.session_state[key] = [] if key == 'uploaded_pdfs' else []
                 
-                # Clear temp_data and vectorstore
-                if os.path.exists("temp_data"):
-                    shutil.rmtree("temp_data")
-                    os.makedirs("temp_data")
-                if os.path.exists("vectorstore"):
-                    shutil.rmtree("vectorstore")
-                    os.makedirs("vectorstore")
+                # Clear this session's uploads and vector index
+                namespace.clear()
                 
                 st.success("✅ Current session cleared!")
                 st.rerun()
@@ -656,9 +666,14 @@ with st.sidebar:
 
 # --- Mode 1: Research Question ---
 from src.question_suggester import generate_smart_questions
-from src.pdf_loader import extract_text_from_pdf
+from src.pdf_loader import extract_sections, extract_texts_from_pdfs
+from src.prompt_budget import TASK_SECTIONS
 import os, shutil, streamlit as st
-from src.rag_pipeline import create_or_load_vectorstore, get_qa_chain
+from src.rag_pipeline import create_or_load_vectorstore, embedding_cache_stats, retrieval_cache_stats
+
+if mode != "Ask Question":
+    # Left the Q&A page: stop any retrieval or generation still running for it
+    qa_session.cancel()
 
 if mode == "Ask Question":
     st.markdown("<br>", unsafe_allow_html=True)
@@ -683,29 +698,52 @@ if mode == "Ask Question":
         with st.spinner("📚 Indexing and analyzing your uploaded papers..."):
             # Only regenerate questions if new PDFs uploaded
             uploaded_names = [f.name for f in uploaded_files]
-            if st.session_state.get("last_uploaded") != uploaded_names:
-                if os.path.exists("temp_data"):
-                    shutil.rmtree("temp_data")
-                os.makedirs("temp_data", exist_ok=True)
-
-                combined_text = ""
-                for f in uploaded_files:
-                    path = os.path.join("temp_data", f.name)
+            # (re-index too if this session's namespace was collected while idle)
+            if st.session_state.get("last_uploaded") != uploaded_names or not namespace.has_index():
+                namespace.reset_uploads()
+
+                suggestion_papers = []
+                pdf_bytes = [f.getvalue() for f in uploaded_files]
+                for f, data in zip(uploaded_files, pdf_bytes):
+                    path = os.path.join(namespace.uploads_dir, f.name)
                     with open(path, "wb") as fp:
-                        fp.write(f.read())
-                    f.seek(0)
-                    text = extract_text_from_pdf(f.read())
-                    combined_text += text[:3000]
+                        fp.write(data)
+
+                # Parse all papers in parallel, straight from memory
+                extracted = extract_texts_from_pdfs(pdf_bytes)
+                # Papers share the question-suggestion token budget fairly
+                suggest_tokens = get_llm_client().budget("suggest", STRONG_MODEL).tokens
+                for f, data, (_, error) in zip(uploaded_files, pdf_bytes, extracted):
+                    if error:
+                        st.warning(f"⚠️ Could not read {f.name}: {error}")
+                        continue
+                    suggestion_papers.append(
+                        (f.name, extract_sections(data, TASK_SECTIONS["suggest"], max_tokens=suggest_tokens))
+                    )
 
-                create_or_load_vectorstore("temp_data")
+                db = create_or_load_vectorstore(namespace.uploads_dir, index_dir=namespace.index_dir)
+                st.session_state["ingest_stats"] = db.ingest_stats
 
                 with st.spinner("🤖 Generating smart questions..."):
                     st.session_state["suggested_questions"] = generate_smart_questions(
-                        combined_text, n=5
+                        suggestion_papers, n=5
                     )
+                # Retrieve context for the suggestions before anyone clicks one
+                qa_session.prefetch(st.session_state["suggested_questions"])
                 st.session_state["last_uploaded"] = uploaded_names
 
         st.success(f"✅ Successfully indexed {len(uploaded_files)} paper(s)!")
+        cache_stats = embedding_cache_stats()
+        if cache_stats["hits"] + cache_stats["misses"]:
+            st.caption(
+                f"🧮 Embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['hit_ratio']:.0%} reused)"
+            )
+        ingest_stats = st.session_state.get("ingest_stats")
+        if ingest_stats and ingest_stats["chunks"]:
+            st.caption(
+                f"⚡ Indexed {ingest_stats['chunks']} chunks at {ingest_stats['chunks_per_sec']:.0f} chunks/sec"
+            )
 
     # === Smart Question Suggestions ===
     if st.session_state["suggested_questions"]:
@@ -732,29 +770,35 @@ if mode == "Ask Question":
         search_btn = st.button("🚀 Search", use_container_width=True)
 
     if search_btn:
-        if not os.path.exists("vectorstore"):
+        if not namespace.has_index():
             st.warning("⚠️ Please upload and index PDFs first!")
         elif not query.strip():
             st.warning("⚠️ Please enter or select a question.")
         else:
             try:
-                with st.spinner("🤔 Analyzing papers and generating answer..."):
-                    chain = get_qa_chain()
-                    response = chain(query)
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("### 🎯 Answer")
+                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
+                # The spinner covers retrieval only; the answer then renders as Gemini writes it
+                with st.spinner("🤔 Analyzing papers..."):
+                    qa_session.prepare(query)
+                response = st.write_stream(qa_session.stream(query))
+                st.markdown('</div>', unsafe_allow_html=True)
 
-                # Save to history
+                # Save to history (the full text, once the stream has finished)
                 st.session_state["qa_history"].append({
                     "question": query,
                     "answer": response,
                     "timestamp": datetime.now().isoformat(),
                     "papers": st.session_state.get("last_uploaded", [])
                 })
-
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("### 🎯 Answer")
-                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                st.markdown(response)
-                st.markdown('</div>', unsafe_allow_html=True)
+                cache_stats = retrieval_cache_stats()
+                retrieval_stats, answer_stats = cache_stats["retrievals"], cache_stats["answers"]
+                st.caption(
+                    f"🔁 Retrieval cache: {retrieval_stats['hits']} hits / {retrieval_stats['misses']} misses "
+                    f"({retrieval_stats['hit_ratio']:.0%} served from cache) · "
+                    f"Answer cache: {answer_stats['hit_ratio']:.0%} reused"
+                )
             except Exception as e:
                 st.error(str(e))
                 st.info("💡 Tip: If the API is overloaded, please wait a few moments and try again.")
@@ -808,14 +852,13 @@ elif mode == "Compare Two Papers":
         
         if analyze_btn:
             with st.spinner("🔍 Extracting and analyzing methodology in detail..."):
-                text1 = extract_text_from_pdf(file1.read())
-                methods1 = extract_methods_section(text1)
+                methods1 = extract_methods_section(file1.getvalue())
 
-                detail_prompt = f"""
+                detail_template = """
 You are an expert research analyst. Provide a **comprehensive and detailed analysis** of the methodology section from this research paper.
 
 **Paper Methods:**
-{methods1}
+{methods}
 
 Please structure your analysis as a **detailed Markdown report** covering:
 
@@ -860,32 +903,35 @@ Please structure your analysis as a **detailed Markdown report** covering:
 
 If any section is not explicitly mentioned in the paper, note it as "Not explicitly mentioned" but provide reasonable inferences if possible.
 """
+                # Long methods sections are cut to the model's token budget, not sent whole
+                methods_budget = get_llm_client().budget("methods")
+                detail_prompt = detail_template.format(
+                    methods=methods_budget.fit(methods1, detail_template.format(methods=""))
+                )
 
-                try:
-                    response = call_gemini("Analyze research methodology", detail_prompt)
-                    
-                    # Save to history
-                    st.session_state["comparison_results"].append({
-                        "type": "single_paper_analysis",
-                        "paper": file1.name,
-                        "result": response,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    
-                    # --- Render Detailed Analysis ---
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    st.markdown("### 🔬 Detailed Methodology Analysis")
-                    st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                    st.markdown(response)
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    with st.expander("📄 View Raw Extracted Methods Section"):
-                        st.subheader(file1.name)
-                        st.text_area("Extracted Methods", methods1, height=300, label_visibility="collapsed")
-                        
-                except Exception as e:
-                    st.error(str(e))
-                    st.info("💡 Tip: If the API is overloaded, please wait a few moments and try again.")
+            try:
+                # --- Render Detailed Analysis (streamed as it is generated) ---
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("### 🔬 Detailed Methodology Analysis")
+                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
+                response = st.write_stream(call_gemini_stream("Analyze research methodology", detail_prompt))
+                st.markdown('</div>', unsafe_allow_html=True)
+
+                # Save to history
+                st.session_state["comparison_results"].append({
+                    "type": "single_paper_analysis",
+                    "paper": file1.name,
+                    "result": response,
+                    "timestamp": datetime.now().isoformat()
+                })
+
+                with st.expander("📄 View Raw Extracted Methods Section"):
+                    st.subheader(file1.name)
+                    st.text_area("Extracted Methods", methods1, height=300, label_visibility="collapsed")
+
+            except Exception as e:
+                st.error(str(e))
+                st.info("💡 Tip: If the API is overloaded, please wait a few moments and try again.")
 
     # Handle two paper comparison case
     elif file1 and file2:
@@ -895,13 +941,14 @@ If any section is not explicitly mentioned in the paper, note it as "Not explici
         
         if compare_btn:
             with st.spinner("🔄 Extracting and comparing methodologies..."):
-                text1 = extract_text_from_pdf(file1.read())
-                text2 = extract_text_from_pdf(file2.read())
+                pdf1, pdf2 = file1.getvalue(), file2.getvalue()
+                # Parse both papers in parallel; sections then come from the document store
+                extract_texts_from_pdfs([pdf1, pdf2])
 
-                methods1 = extract_methods_section(text1)
-                methods2 = extract_methods_section(text2)
+                methods1 = extract_methods_section(pdf1)
+                methods2 = extract_methods_section(pdf2)
 
-                compare_prompt = f"""
+                compare_template = """
 You are an expert research analyst. Compare the **Methodology** sections of two research papers.
 
 **Paper 1 Methods:**
@@ -926,40 +973,45 @@ Include aspects like:
 Make sure the table is valid Markdown and readable in Streamlit.
 If any information is missing, mark it as "Not mentioned".
 """
+                # Both papers share the budget; a short section leaves room for the longer one
+                compare_budget = get_llm_client().budget("compare")
+                fitted1, fitted2 = compare_budget.fit_many(
+                    [methods1, methods2], compare_template.format(methods1="", methods2="")
+                )
+                compare_prompt = compare_template.format(methods1=fitted1, methods2=fitted2)
 
-                try:
-                    response = call_gemini("Compare research methodologies", compare_prompt)
-
-                    # Save to history
-                    st.session_state["comparison_results"].append({
-                        "type": "two_paper_comparison",
-                        "paper1": file1.name,
-                        "paper2": file2.name,
-                        "result": response,
-                        "timestamp": datetime.now().isoformat()
-                    })
-
-                    # --- Render Table Output ---
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    st.markdown("### 🧩 Methodology Comparison Table")
-                    
-                    # Wrap in a container div with custom styling
-                    st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                    st.markdown(response)  # Let Streamlit render the Markdown table
-                    st.markdown('</div>', unsafe_allow_html=True)
-
-                    with st.expander("🔬 View Raw Extracted Methods"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.subheader(file1.name)
-                            st.text_area("Paper 1 Methods", methods1, height=200, label_visibility="collapsed")
-                        with col2:
-                            st.subheader(file2.name)
-                            st.text_area("Paper 2 Methods", methods2, height=200, label_visibility="collapsed")
-                            
-                except Exception as e:
-                    st.error(str(e))
-                    st.info("💡 Tip: If the API is overloaded, please wait a few moments and try again.")
+            try:
+                # --- Render Table Output ---
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("### 🧩 Methodology Comparison Table")
+
+                # Wrap in a container div with custom styling
+                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
+                # Streamlit re-renders the Markdown table as rows arrive
+                response = st.write_stream(call_gemini_stream("Compare research methodologies", compare_prompt))
+                st.markdown('</div>', unsafe_allow_html=True)
+
+                # Save to history
+                st.session_state["comparison_results"].append({
+                    "type": "two_paper_comparison",
+                    "paper1": file1.name,
+                    "paper2": file2.name,
+                    "result": response,
+                    "timestamp": datetime.now().isoformat()
+                })
+
+                with st.expander("🔬 View Raw Extracted Methods"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.subheader(file1.name)
+                        st.text_area("Paper 1 Methods", methods1, height=200, label_visibility="collapsed")
+                    with col2:
+                        st.subheader(file2.name)
+                        st.text_area("Paper 2 Methods", methods2, height=200, label_visibility="collapsed")
+
+            except Exception as e:
+                st.error(str(e))
+                st.info("💡 Tip: If the API is overloaded, please wait a few moments and try again.")
 
 
 # --- Literature Review Generator ---
@@ -1001,18 +1053,29 @@ elif mode == "Literature Review Generator":
             generate_btn = st.button("✨ Generate Review", use_container_width=True)
         
         if generate_btn:
-            from src.pdf_loader import extract_text_from_pdf
-            from src.literature_review import generate_literature_review
+            from src.pdf_loader import extract_sections, extract_text_budgeted
+            from src.literature_review import stream_literature_review
 
             try:
                 with st.spinner("🧠 Reading papers and synthesizing review..."):
-                    combined_text = ""
+                    review_papers = []
+                    review_tokens = get_llm_client().budget("review").tokens
                     for f in uploads:
-                        text = extract_text_from_pdf(f.read())
-                        # only grab important parts to keep prompt efficient
-                        combined_text += f"\n\n=== {f.name} ===\n{text[:2000]}"
+                        try:
+                            # only the important sections; the review budget is shared across papers
+                            sections = extract_sections(f.getvalue(), TASK_SECTIONS["review"], max_tokens=review_tokens)
+                        except Exception as e:
+                            st.warning(f"⚠️ Could not read {f.name}: {e}")
+                            continue
+                        review_papers.append((f.name, sections))
 
-                    review = generate_literature_review(combined_text)
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("### 📝 Your Literature Review")
+                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
+                # Show the review as it is written
+                review = st.write_stream(stream_literature_review(review_papers))
+                st.markdown('</div>', unsafe_allow_html=True)
+                st.success("✅ Literature Review Generated Successfully!")
 
                 # Save to history
                 st.session_state["literature_reviews"].append({
@@ -1021,13 +1084,6 @@ elif mode == "Literature Review Generator":
                     "timestamp": datetime.now().isoformat()
                 })
 
-                st.success("✅ Literature Review Generated Successfully!")
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("### 📝 Your Literature Review")
-                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                st.markdown(review)
-                st.markdown('</div>', unsafe_allow_html=True)
-
                 # Optional download button
                 st.markdown("<br>", unsafe_allow_html=True)
                 col1, col2, col3 = st.columns([2, 1, 2])
@@ -1042,9 +1098,11 @@ elif mode == "Literature Review Generator":
 
                 with st.expander("📚 View Source Paper Previews"):
                     for idx, f in enumerate(uploads):
-                        f.seek(0)
                         st.markdown(f"#### 📄 {f.name}")
-                        preview_text = extract_text_from_pdf(f.read())[:1500]
+                        try:
+                            preview_text = extract_text_budgeted(f.getvalue(), max_chars=1500)
+                        except Exception:
+                            preview_text = "⚠️ Preview unavailable."
                         st.text_area(f"Preview {idx+1}", preview_text, height=150, label_visibility="collapsed")
                         
             except Exception as e:
@@ -1065,13 +1123,17 @@ elif mode == "Dataset / Metric Extractor":
                 st.markdown(f"### Extraction #{len(st.session_state['dataset_extractions']) - idx}")
                 st.caption(f"📅 {datetime.fromisoformat(extract_data['timestamp']).strftime('%b %d, %Y %I:%M %p')}")
                 st.caption(f"📄 Papers: {', '.join(extract_data['papers'])}")
+                # Older workspaces saved the tables under "result"
+                extract_text = extract_data.get('results', extract_data.get('result', ''))
                 st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                st.markdown(extract_data['result'])
+                st.markdown(extract_text)
                 st.markdown('</div>', unsafe_allow_html=True)
+                if extract_data.get('summary'):
+                    st.markdown(extract_data['summary'])
                 
                 st.download_button(
                     label="💾 Download Extraction",
-                    data=extract_data['result'],
+                    data=extract_text,
                     file_name=f"dataset_extraction_{idx+1}.txt",
                     mime="text/plain",
                     key=f"download_extract_{idx}"
@@ -1086,6 +1148,23 @@ elif mode == "Dataset / Metric Extractor":
         help="Upload papers to extract datasets and metrics automatically"
     )
 
+    from src.dataset_metric_extractor import EXTRACT_MODE, EXTRACT_MODES, ExtractionSummary, extract_many
+
+    extract_mode_labels = {
+        "scan": "⚡ Known names + Gemini check",
+        "fast": "🚀 Known names only (no API call)",
+        "full": "🤖 Full Gemini read",
+    }
+    extract_mode = st.radio(
+        "Extraction mode",
+        list(EXTRACT_MODES),
+        index=list(EXTRACT_MODES).index(EXTRACT_MODE) if EXTRACT_MODE in EXTRACT_MODES else 0,
+        format_func=extract_mode_labels.get,
+        horizontal=True,
+        help="Scanning for known dataset and metric names sends Gemini only the passages around them; "
+             "known names only skips Gemini entirely; a full read also finds names outside the lexicon."
+    )
+
     # === Action button ===
     if uploads:
         col1, col2, col3 = st.columns([2, 1, 2])
@@ -1093,37 +1172,76 @@ elif mode == "Dataset / Metric Extractor":
             analyze_btn = st.button("🔍 Analyze Papers", use_container_width=True)
         
         if analyze_btn:
-            from src.pdf_loader import extract_text_from_pdf
-            from src.dataset_metric_extractor import extract_datasets_and_metrics_with_gemini
+            from src.pdf_loader import extract_sections
             import os
 
             try:
-                with st.spinner("🤖 Analyzing papers with Gemini AI..."):
-                    combined_results = ""
-                    for f in uploads:
-                        # Extract text from each uploaded paper
-                        text = extract_text_from_pdf(f.read())
+                # === Display results as each paper finishes ===
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown("### 🧩 Dataset & Metric Analysis")
+                progress = st.progress(0.0, text="🤖 Analyzing papers with Gemini AI...")
+                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
+                slots = [st.empty() for _ in uploads]
+                st.markdown('</div>', unsafe_allow_html=True)
 
-                        # Gemini-powered dataset + metric extraction
-                        result = extract_datasets_and_metrics_with_gemini(text)
+                # Parse all papers in parallel first; sections then come from the document store
+                pdf_bytes = [f.getvalue() for f in uploads]
+                extracted = extract_texts_from_pdfs(pdf_bytes)
+                extract_tokens = get_llm_client().budget("extract").tokens
+                results = [None] * len(uploads)
+                extractions = [None] * len(uploads)
+                papers, paper_slots = [], []
+                for i, (f, data, (text, error)) in enumerate(zip(uploads, pdf_bytes, extracted)):
+                    if error:
+                        results[i] = f"⚠️ Could not read PDF: {error}"
+                        slots[i].markdown(f"## 📄 {f.name}\n{results[i]}")
+                        continue
+                    if extract_mode == "full":
+                        # Experiments and results first: that is where datasets and metrics are
+                        papers.append((f.name, extract_sections(data, TASK_SECTIONS["extract"], max_tokens=extract_tokens)))
+                    else:
+                        # The scan is cheap, so it reads the whole paper
+                        papers.append((f.name, text))
+                    paper_slots.append(i)
+                    slots[i].markdown(f"## 📄 {f.name}\n⏳ Analyzing...")
+
+                # Gemini-powered dataset + metric extraction, several papers at a time
+                failed = sum(result is not None for result in results)
+                for done, (j, name, result, error) in enumerate(extract_many(papers, mode=extract_mode), 1):
+                    i = paper_slots[j]
+                    if error is not None:
+                        failed += 1
+                        result = error if error.startswith("⚠️") else f"⚠️ {error}"
+                    else:
+                        extractions[i] = result
+                        result = result.to_markdown()
+                    results[i] = result
+                    slots[i].markdown(f"## 📄 {name}\n{result}")
+                    progress.progress(done / len(papers), text=f"🤖 Analyzed {done}/{len(papers)} papers")
+                progress.empty()
+
+                combined_results = "".join(
+                    f"\n\n## 📄 {f.name}\n{result}" for f, result in zip(uploads, results)
+                )
 
-                        combined_results += f"\n\n## 📄 {f.name}\n{result}"
+                # === Consolidated summary, aggregated locally from the records ===
+                extractions = [extraction for extraction in extractions if extraction is not None]
+                summary = ExtractionSummary(extractions)
+                summary_markdown = summary.to_markdown()
 
                 # Save to history
                 st.session_state["dataset_extractions"].append({
                     "papers": [f.name for f in uploads],
                     "results": combined_results,
+                    "records": [extraction.to_dict() for extraction in extractions],
+                    "summary": summary_markdown,
                     "timestamp": datetime.now().isoformat()
                 })
 
-                st.success("✅ Analysis Complete!")
-
-                # === Display results ===
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("### 🧩 Dataset & Metric Analysis")
-                st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                st.markdown(combined_results)
-                st.markdown('</div>', unsafe_allow_html=True)
+                if failed:
+                    st.warning(f"⚠️ {failed} of {len(uploads)} paper(s) could not be analyzed; results for the others are kept.")
+                else:
+                    st.success("✅ Analysis Complete!")
 
                 # === Download button ===
                 st.markdown("<br>", unsafe_allow_html=True)
@@ -1137,30 +1255,22 @@ elif mode == "Dataset / Metric Extractor":
                         use_container_width=True
                     )
 
-                # === Optional consolidation summary ===
-                with st.spinner("📈 Generating consolidated summary..."):
-                    import google.generativeai as genai
-                    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-                    model = genai.GenerativeModel("gemini-2.5-pro")
-
-                    summary_prompt = f"""
-                    Combine the following per-paper tables into a unified summary.
-
-                    Include:
-                    - Top datasets and metrics (frequency & domain)
-                    - Observed trends across papers
-                    - 2–3 sentence insight summary
-
-                    Per-paper details:
-                    {combined_results}
-                    """
-                    consolidated = model.generate_content(summary_prompt).text
-
                 st.markdown("<br>", unsafe_allow_html=True)
                 st.markdown("### 📈 Consolidated Summary")
                 st.markdown('<div class="answer-card">', unsafe_allow_html=True)
-                st.markdown(consolidated)
+                st.markdown(summary_markdown)
                 st.markdown('</div>', unsafe_allow_html=True)
+                if len(summary.pairs):
+                    with st.expander("🔗 Dataset × metric co-occurrence", expanded=False):
+                        st.dataframe(summary.pairs, use_container_width=True, hide_index=True)
+
+                response_cache = get_llm_client().cache
+                if response_cache is not None:
+                    response_stats = response_cache.stats()
+                    st.caption(
+                        f"💾 Response cache: {response_stats['hits']} hits / {response_stats['misses']} misses "
+                        f"({response_stats['hit_ratio']:.0%} answered without calling Gemini)"
+                    )
                 
             except Exception as e:
                 st.error(str(e))
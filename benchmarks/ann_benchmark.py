@@ -0,0 +1,97 @@
+# ann_benchmark.py
+"""
+Recall-versus-latency report for the vector index backends.
+
+Builds every backend in src.vector_index on synthetic, clustered 384-d
+vectors (the shape of all-MiniLM-L6-v2 embeddings), sweeps nprobe/efSearch
+and prints recall@10 against exact search, per-query latency, build time
+and index size. These numbers back the defaults in choose_index_kind.
+
+Usage: python -m benchmarks.ann_benchmark [--sizes 20000,100000] [--queries 200]
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from src.vector_index import INDEX_KINDS, build_faiss_index, set_search_params
+
+DIM = 384
+K = 10
+EF_SEARCH_SWEEP = (16, 32, 64, 128)
+NPROBE_SWEEP = (4, 8, 16, 32)
+
+
+def synthetic_embeddings(n, n_clusters=256, latent_dim=48, seed=0):
+    """
+    Unit vectors around random topic centroids in a low-dimensional latent
+    space, projected up to DIM. Sentence embeddings have low intrinsic
+    dimension; isotropic 384-d noise would understate what PQ can do.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, latent_dim)).astype("float32")
+    labels = rng.integers(0, n_clusters, size=n)
+    latent = centers[labels] + 0.5 * rng.standard_normal((n, latent_dim)).astype("float32")
+    projection = rng.standard_normal((latent_dim, DIM)).astype("float32")
+    noise = 0.05 * np.sqrt(latent_dim) * rng.standard_normal((n, DIM)).astype("float32")
+    vectors = latent @ projection + noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries):
+    started = time.perf_counter()
+    results = [index.search(q[None, :], K)[1][0] for q in queries]
+    return np.array(results), (time.perf_counter() - started) / len(queries) * 1000
+
+
+def report(n, n_queries):
+    data = synthetic_embeddings(n + n_queries)
+    corpus, queries = data[:n], data[n:]
+    ids = np.arange(n, dtype="int64")
+
+    exact = faiss.IndexFlatL2(DIM)
+    exact.add(corpus)
+    _, truth = exact.search(queries, K)
+
+    print(f"\n=== {n:,} vectors, {n_queries} queries, recall@{K} ===")
+    print(f"{'backend':<10} {'param':<14} {'recall':>7} {'ms/query':>9} {'build s':>8} {'MB':>8}")
+    for kind in INDEX_KINDS:
+        started = time.perf_counter()
+        train = corpus[np.random.default_rng(0).choice(n, size=min(n, 100_000), replace=False)]
+        index = build_faiss_index(kind, DIM, train if kind.startswith("ivf") else None)
+        index.add_with_ids(corpus, ids)
+        build_seconds = time.perf_counter() - started
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+
+        if kind == "hnsw":
+            sweep = [("efSearch", v, dict(ef_search=v)) for v in EF_SEARCH_SWEEP]
+        elif kind.startswith("ivf"):
+            sweep = [("nprobe", v, dict(nprobe=v)) for v in NPROBE_SWEEP]
+        else:
+            sweep = [("-", "", {})]
+
+        for name, value, params in sweep:
+            set_search_params(index, **params)
+            found, ms = timed_search(index, queries)
+            label = f"{name}={value}" if value != "" else "exact"
+            print(f"{kind:<10} {label:<14} {recall_at_k(found, truth):7.3f} {ms:9.3f} {build_seconds:8.1f} {size_mb:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="20000,100000", help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for n in (int(s) for s in args.sizes.split(",")):
+        report(n, args.queries)
+
+
+if __name__ == "__main__":
+    main()
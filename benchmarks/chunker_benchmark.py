@@ -0,0 +1,75 @@
+# chunker_benchmark.py
+"""
+Throughput and memory of the offset-based chunker versus LangChain's
+RecursiveCharacterTextSplitter on a synthetic corpus.
+
+Usage: python -m benchmarks.chunker_benchmark [--mb 20]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.chunker import CHUNK_OVERLAP, CHUNK_SIZE, chunk_spans
+
+WORDS = (
+    "the model attention transformer dataset imagenet coco accuracy baseline "
+    "we propose training evaluation results significantly improves learning "
+    "network layer loss gradient benchmark f1 bleu experiments method"
+).split()
+
+
+def synthetic_corpus(n_chars, seed=0):
+    """
+    Paper-like text: sentences grouped into lines and paragraphs.
+    """
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < n_chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 20))) + ". "
+        parts.append(sentence)
+        size += len(sentence)
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append("\n\n")
+        elif roll < 0.25:
+            parts.append("\n")
+    return "".join(parts)[:n_chars]
+
+
+def measure(label, fn, text):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(text)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    mb = len(text) / 1e6
+    print(f"{label:<34} {len(result):>8} chunks  {mb / elapsed:8.1f} MB/s  peak {peak / 1e6:8.1f} MB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=20, help="corpus size in MB of text")
+    args = parser.parse_args()
+
+    text = synthetic_corpus(int(args.mb * 1e6))
+    print(f"Corpus: {len(text) / 1e6:.1f} MB, chunk_size={CHUNK_SIZE}, chunk_overlap={CHUNK_OVERLAP}\n")
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    measure("RecursiveCharacterTextSplitter", splitter.split_text, text)
+    spans = measure("chunk_spans (offsets only)", chunk_spans, text)
+    measure(
+        "chunk_spans + materialize strings",
+        lambda t: [t[s:e] for s, e in chunk_spans(t)],
+        text,
+    )
+    print(f"\nAverage chunk length: {sum(e - s for s, e in spans) / len(spans):.0f} chars")
+
+
+if __name__ == "__main__":
+    main()
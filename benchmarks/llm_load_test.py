@@ -0,0 +1,151 @@
+# llm_load_test.py
+"""
+Offline load test for the LLM call path.
+
+Installs an LLMClient on the local stub backend (src.llm_backends.StubBackend)
+and fires concurrent requests through the same entry points the app uses
+(call_gemini, or its async/streaming variants), so rate limiting, the
+concurrency cap, retries and the circuit breaker all run for real while no
+API is called. Prints throughput, latency percentiles, time to first token
+for streams, and how many backend calls and failures it took.
+
+Usage: python -m benchmarks.llm_load_test [--requests 200] [--users 16]
+       [--mode sync|async|stream] [--latency-ms 300] [--sigma 0.5]
+       [--tokens-per-second 200] [--failure-rate 0.1] [--failure-kind mixed]
+       [--server-concurrency 0] [--rpm 600] [--max-concurrency 8]
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.gemini_wrapper import call_gemini, call_gemini_async, call_gemini_stream
+from src.llm_backends import StubBackend
+from src.llm_client import CircuitOpenError, LLMClient, set_llm_client
+
+CONTEXT = "Excerpt from [paper.pdf]: we evaluate on CIFAR-10 and report top-1 accuracy. " * 20
+
+
+def _question(i):
+    return f"What does paper {i} report on CIFAR-10?"
+
+
+def run_sync(n, users, stream):
+    def one(i):
+        started = time.perf_counter()
+        first = None
+        try:
+            if stream:
+                for _ in call_gemini_stream(_question(i), CONTEXT):
+                    first = first or time.perf_counter() - started
+            else:
+                call_gemini(_question(i), CONTEXT)
+            return time.perf_counter() - started, first, None
+        except Exception as e:
+            return time.perf_counter() - started, first, e
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        return list(pool.map(one, range(n)))
+
+
+def run_async(n, users):
+    async def main():
+        gate = asyncio.Semaphore(users)
+
+        async def one(i):
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    await call_gemini_async(_question(i), CONTEXT)
+                    return time.perf_counter() - started, None, None
+                except Exception as e:
+                    return time.perf_counter() - started, None, e
+
+        return await asyncio.gather(*(one(i) for i in range(n)))
+
+    return asyncio.run(main())
+
+
+def percentiles(values):
+    if not values:
+        return "n/a"
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return f"p50 {p50:7.0f} ms  p95 {p95:7.0f} ms  p99 {p99:7.0f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=16, help="concurrent callers")
+    parser.add_argument("--mode", choices=("sync", "async", "stream"), default="sync")
+    parser.add_argument("--latency-ms", type=float, default=300, help="median time to first token")
+    parser.add_argument("--sigma", type=float, default=0.5, help="lognormal latency shape")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--output-tokens", type=int, default=150)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-kind", default="rate_limit")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--server-concurrency", type=int, default=0, help="stub rejects calls beyond this (0 = off)")
+    parser.add_argument("--rpm", type=float, default=600, help="client requests/minute limit")
+    parser.add_argument("--tpm", type=float, default=10_000_000, help="client tokens/minute limit")
+    parser.add_argument("--max-concurrency", type=int, default=8, help="client concurrency limit")
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = StubBackend(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.sigma,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        failure_rate=args.failure_rate,
+        failure_kind=args.failure_kind,
+        retry_after=args.retry_after,
+        max_concurrency=args.server_concurrency,
+        seed=args.seed,
+    )
+    # No response cache: every request must reach the backend
+    client = LLMClient(
+        backend=backend,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        max_concurrency=args.max_concurrency,
+        max_retries=args.max_retries,
+        cache=False,
+    )
+    set_llm_client(client)
+
+    started = time.perf_counter()
+    if args.mode == "async":
+        results = run_async(args.requests, args.users)
+    else:
+        results = run_sync(args.requests, args.users, stream=args.mode == "stream")
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for latency, _, error in results if error is None]
+    failed = [error for _, _, error in results if error is not None]
+    stats = backend.stats()
+    print(f"mode={args.mode} requests={args.requests} users={args.users} "
+          f"client: {args.rpm:.0f} rpm, {args.max_concurrency} concurrent, {args.max_retries} attempts")
+    print(f"wall time      {elapsed:8.2f} s")
+    print(f"throughput     {len(ok) / elapsed:8.2f} req/s ({len(ok)} ok, {len(failed)} failed)")
+    print(f"latency        {percentiles(ok)}")
+    if args.mode == "stream":
+        print(f"first token    {percentiles([first for _, first, error in results if first is not None])}")
+    rejected = sum(isinstance(error, CircuitOpenError) for error in failed)
+    retries = stats["calls"] - (args.requests - rejected)
+    print(f"backend calls  {stats['calls']:8d} ({retries} retries, {stats['failures']} injected failures, "
+          f"peak {stats['peak_in_flight']} in flight)")
+    print(f"breaker        {client.breaker.state} ({rejected} requests rejected while open)")
+    kinds = {}
+    for error in failed:
+        message = str(error).splitlines()[0][:70]
+        kinds[message] = kinds.get(message, 0) + 1
+    for message, count in sorted(kinds.items(), key=lambda item: -item[1]):
+        print(f"  {count:5d} x {message}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# answer_cache.py
+import os
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Cosine similarity above which two questions count as the same question
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+
+class _Entry:
+    __slots__ = ("vector", "question", "answer", "created", "last_used")
+
+    def __init__(self, vector, question, answer, now):
+        self.vector = vector
+        self.question = question
+        self.answer = answer
+        self.created = now
+        self.last_used = now
+
+
+class SemanticAnswerCache:
+    """
+    In-memory answer cache for paraphrased questions.
+    Entries are grouped by scope (the indexed document hashes plus the chunk
+    ids retrieved for the question), so an answer is only reused when the
+    model would have seen exactly the same context. Within a scope the most
+    similar earlier question wins if its cosine similarity reaches
+    `threshold`. Entries expire after `ttl` seconds; beyond `max_entries`
+    the least recently used are dropped.
+    """
+
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._scopes: Dict[Hashable, List[_Entry]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype="float32").ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, scope: Hashable, now: float) -> List[_Entry]:
+        entries = self._scopes.get(scope, [])
+        live = [entry for entry in entries if now - entry.created < self.ttl]
+        if len(live) != len(entries):
+            self._size -= len(entries) - len(live)
+            if live:
+                self._scopes[scope] = live
+            else:
+                del self._scopes[scope]
+        return live
+
+    def lookup(self, scope: Hashable, query_vector) -> Optional[str]:
+        """
+        Stored answer for a question similar enough to `query_vector`, or None.
+        """
+        now = time.time()
+        with self._lock:
+            entries = self._expire(scope, now)
+            if entries:
+                similarities = np.stack([entry.vector for entry in entries]) @ self._unit(query_vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entries[best].last_used = now
+                    self.hits += 1
+                    return entries[best].answer
+            self.misses += 1
+            return None
+
+    def store(self, scope: Hashable, query_vector, question: str, answer: str):
+        now = time.time()
+        with self._lock:
+            self._expire(scope, now)
+            self._scopes.setdefault(scope, []).append(_Entry(self._unit(query_vector), question, answer, now))
+            self._size += 1
+            if self._size > self.max_entries:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        for scope in list(self._scopes):
+            self._expire(scope, now)
+        overflow = self._size - self.max_entries
+        if overflow <= 0:
+            return
+        ranked = sorted(
+            ((entry.last_used, scope, entry) for scope, entries in self._scopes.items() for entry in entries),
+            key=lambda item: item[0],
+        )
+        for _, scope, entry in ranked[:overflow]:
+            self._scopes[scope].remove(entry)
+            if not self._scopes[scope]:
+                del self._scopes[scope]
+        self._size -= overflow
+
+    def clear(self):
+        with self._lock:
+            self._scopes.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+        }
@@ -0,0 +1,65 @@
+# async_runtime.py
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Process-wide event loop running in a daemon thread. Every session's
+    async QA work is multiplexed on it, so waiting on the network never
+    ties up a Streamlit script thread.
+    """
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="async-qa-loop").start()
+        return _loop
+
+
+def submit(coro: Awaitable[T]):
+    """
+    Schedule `coro` on the shared loop; returns a concurrent.futures.Future.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    Run `coro` on the shared loop and wait for its result. If the calling
+    thread is interrupted while waiting, the coroutine is cancelled.
+    """
+    future = submit(coro)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def iterate_sync(agen: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Plain generator over an async generator running on the shared loop
+    (e.g. for st.write_stream). Closing it early, as Streamlit does when the
+    user navigates away mid-stream, closes the async generator and so
+    cancels the request behind it.
+    """
+    try:
+        while True:
+            try:
+                yield run_sync(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        if aclose is not None:
+            try:
+                run_sync(aclose(), timeout=5)
+            except Exception:
+                pass
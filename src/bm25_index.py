@@ -0,0 +1,194 @@
+# bm25_index.py
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Compact postings once this share of indexed chunks has been removed
+MAX_DEAD_RATIO = 0.25
+
+# Words, numbers and joined forms such as "ImageNet-1k", "BLEU-4" or "F1"
+_TOKEN = re.compile(r"\w+(?:[-.]\w+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with we".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased terms of `text`. Joined forms are kept whole and also split
+    into their parts, so "cifar-10" matches both "CIFAR-10" and "CIFAR 10".
+    """
+    terms = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if "-" in token or "." in token:
+            terms.extend(part for part in re.split(r"[-.]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    In-process inverted index over chunk texts with Okapi BM25 scoring.
+    Each term's postings are two flat arrays (chunk ids, term frequencies)
+    that only grow at the end, since chunk ids are handed out in increasing
+    order. Removed chunks are masked by a zero length and dropped from the
+    postings by compact().
+    """
+
+    def __init__(self):
+        self.terms: Dict[str, int] = {}  # term -> postings slot
+        self._ids: List[array] = []  # per term: chunk ids ("q")
+        self._tfs: List[array] = []  # per term: term frequencies ("I")
+        self._lengths = array("I")  # chunk id -> token count, 0 once removed
+        self.n_chunks = 0
+        self.total_length = 0
+        self.n_dead = 0
+
+    # --- updates ---------------------------------------------------------
+
+    def add(self, chunk_id: int, text: str):
+        counts = Counter(tokenize(text))
+        if chunk_id >= len(self._lengths):
+            self._lengths.extend([0] * (chunk_id + 1 - len(self._lengths)))
+        length = sum(counts.values())
+        if not length:
+            return
+        self._lengths[chunk_id] = length
+        self.n_chunks += 1
+        self.total_length += length
+        for term, tf in counts.items():
+            slot = self.terms.get(term)
+            if slot is None:
+                slot = self.terms[term] = len(self._ids)
+                self._ids.append(array("q"))
+                self._tfs.append(array("I"))
+            self._ids[slot].append(chunk_id)
+            self._tfs[slot].append(tf)
+
+    def remove(self, chunk_ids: Iterable[int]):
+        for chunk_id in chunk_ids:
+            if chunk_id < len(self._lengths) and self._lengths[chunk_id]:
+                self.total_length -= self._lengths[chunk_id]
+                self._lengths[chunk_id] = 0
+                self.n_chunks -= 1
+                self.n_dead += 1
+        if self.n_dead > MAX_DEAD_RATIO * max(self.n_chunks + self.n_dead, 1):
+            self.compact()
+
+    def compact(self):
+        """
+        Drop removed chunks from the postings (and terms left with none).
+        """
+        lengths = np.frombuffer(self._lengths, dtype="uint32")
+        terms, ids, tfs = {}, [], []
+        for term, slot in self.terms.items():
+            term_ids = np.frombuffer(self._ids[slot], dtype="int64")
+            live = lengths[term_ids] > 0
+            if not live.any():
+                continue
+            terms[term] = len(ids)
+            ids.append(array("q", term_ids[live].tobytes()) if not live.all() else self._ids[slot])
+            tfs.append(array("I", np.frombuffer(self._tfs[slot], dtype="uint32")[live].tobytes()) if not live.all() else self._tfs[slot])
+        self.terms, self._ids, self._tfs = terms, ids, tfs
+        self.n_dead = 0
+
+    # --- search ----------------------------------------------------------
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        Top `k` (chunk id, BM25 score) pairs for `query`, best first.
+        """
+        if not self.n_chunks or k <= 0:
+            return []
+        lengths = np.frombuffer(self._lengths, dtype="uint32")
+        avg_length = self.total_length / self.n_chunks
+
+        all_ids, all_scores = [], []
+        for term, query_tf in Counter(tokenize(query)).items():
+            slot = self.terms.get(term)
+            if slot is None:
+                continue
+            ids = np.frombuffer(self._ids[slot], dtype="int64")
+            doc_lengths = lengths[ids]
+            live = doc_lengths > 0
+            df = int(live.sum())
+            if not df:
+                continue
+            ids, doc_lengths = ids[live], doc_lengths[live]
+            tf = np.frombuffer(self._tfs[slot], dtype="uint32")[live].astype("float32")
+            idf = math.log(1 + (self.n_chunks - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+            all_ids.append(ids)
+            all_scores.append(query_tf * idf * tf * (BM25_K1 + 1) / (tf + norm))
+        if not all_ids:
+            return []
+
+        chunk_ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(chunk_ids[i]), float(scores[i])) for i in top]
+
+    # --- persistence -----------------------------------------------------
+
+    def save(self, path: str):
+        """
+        Write the postings as one CSR-style .npz (no pickled objects).
+        """
+        self.compact()
+        terms = list(self.terms)
+        slots = [self.terms[term] for term in terms]
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        offsets[1:] = np.cumsum([len(self._ids[slot]) for slot in slots])
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                terms=np.array(terms, dtype=str),
+                offsets=offsets,
+                ids=np.concatenate([np.frombuffer(self._ids[s], dtype="int64") for s in slots] or [np.zeros(0, "int64")]),
+                tfs=np.concatenate([np.frombuffer(self._tfs[s], dtype="uint32") for s in slots] or [np.zeros(0, "uint32")]),
+                lengths=np.frombuffer(self._lengths, dtype="uint32"),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            offsets, ids, tfs = data["offsets"], data["ids"], data["tfs"]
+            for slot, term in enumerate(data["terms"].tolist()):
+                index.terms[term] = slot
+                index._ids.append(array("q", ids[offsets[slot]:offsets[slot + 1]].tobytes()))
+                index._tfs.append(array("I", tfs[offsets[slot]:offsets[slot + 1]].tobytes()))
+            index._lengths = array("I", data["lengths"].tobytes())
+        lengths = np.frombuffer(index._lengths, dtype="uint32")
+        index.n_chunks = int((lengths > 0).sum())
+        index.total_length = int(lengths.sum())
+        return index
+
+    @classmethod
+    def from_chunks(cls, chunks: Dict[int, Tuple[str, dict]]) -> "BM25Index":
+        index = cls()
+        for chunk_id in sorted(chunks):
+            index.add(chunk_id, chunks[chunk_id][0])
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[int]], k: int = 60) -> List[int]:
+    """
+    Merge ranked id lists: each id scores sum(1 / (k + rank)) over the lists
+    it appears in. Robust to the incomparable scales of BM25 and L2 distance.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,199 @@
+# chunk_store.py
+import json
+import os
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+# On-disk layout (all plain arrays, nothing is unpickled on load):
+#   chunk_ids.npy       int64[n]   sorted chunk ids, one row per chunk
+#   text_offsets.npy    int64[n+1] byte offsets of each chunk in texts.bin
+#   texts.bin           UTF-8 chunk texts, concatenated
+#   meta.<key>.npy      one column per metadata key (see _encode_column)
+#   columns.json        column kinds and the string tables of "str" columns
+IDS_FILE = "chunk_ids.npy"
+OFFSETS_FILE = "text_offsets.npy"
+TEXTS_FILE = "texts.bin"
+COLUMNS_FILE = "columns.json"
+COLUMN_PREFIX = "meta."
+
+MISSING_INT = np.iinfo("int64").min
+
+
+def _encode_column(values):
+    """
+    (kind, array, string table) for one metadata column. Ints are int64 with
+    MISSING_INT for absent values, floats are float64 with NaN, and strings
+    are int32 codes into a table (-1 when absent).
+    """
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+        return "int", np.array([MISSING_INT if v is None else v for v in values], dtype="int64"), None
+    if all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in present):
+        return "float", np.array([np.nan if v is None else v for v in values], dtype="float64"), None
+    if all(isinstance(v, str) for v in present):
+        table = sorted(set(present))
+        codes = {s: i for i, s in enumerate(table)}
+        return "str", np.array([-1 if v is None else codes[v] for v in values], dtype="int32"), table
+    raise TypeError("Chunk metadata values must be int, float or str")
+
+
+class ChunkStore(MutableMapping):
+    """
+    chunk id -> (text, metadata) mapping backed by memory-mapped columnar
+    files. Loading only maps the files; a chunk is decoded when it is read.
+    Writes are copy-on-write: they go to an in-memory overlay and the mapped
+    base is never modified, so readers sharing the files are unaffected.
+    save() writes base and overlay merged into a new set of files.
+    """
+
+    def __init__(self):
+        self._ids = np.zeros(0, dtype="int64")
+        self._offsets = np.zeros(1, dtype="int64")
+        self._texts = np.zeros(0, dtype="uint8")
+        self._columns: Dict[str, Tuple[str, np.ndarray, Optional[list]]] = {}
+        self._added: Dict[int, Tuple[str, dict]] = {}
+        self._removed = set()  # base ids deleted or overridden by _added
+
+    # --- persistence -----------------------------------------------------
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(os.path.join(path, COLUMNS_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkStore":
+        store = cls()
+        with open(os.path.join(path, COLUMNS_FILE), "r", encoding="utf-8") as f:
+            columns = json.load(f)
+        store._ids = np.load(os.path.join(path, IDS_FILE), mmap_mode="r")
+        store._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        if store._offsets[-1]:
+            store._texts = np.memmap(os.path.join(path, TEXTS_FILE), dtype="uint8", mode="r")
+        for name, spec in columns.items():
+            array = np.load(os.path.join(path, f"{COLUMN_PREFIX}{name}.npy"), mmap_mode="r")
+            store._columns[name] = (spec["kind"], array, spec.get("table"))
+        return store
+
+    def save(self, path: str):
+        """
+        Write all chunks to `path`. Each file is written to a temp name and
+        moved into place, the column spec last.
+        """
+        def tmp(name):
+            return f".{name}.tmp"
+
+        ids = np.array(sorted(self), dtype="int64")
+        encoded = []
+        offsets = np.zeros(len(ids) + 1, dtype="int64")
+        metadata = []
+        for row, chunk_id in enumerate(ids):
+            text, meta = self[int(chunk_id)]
+            data = text.encode("utf-8")
+            encoded.append(data)
+            offsets[row + 1] = offsets[row] + len(data)
+            metadata.append(meta)
+
+        keys = sorted({key for meta in metadata for key in meta} - {"chunk_id"})
+        columns = {}
+        files = {IDS_FILE: ids, OFFSETS_FILE: offsets}
+        for key in keys:
+            kind, array, table = _encode_column([meta.get(key) for meta in metadata])
+            columns[key] = {"kind": kind, **({"table": table} if table is not None else {})}
+            files[f"{COLUMN_PREFIX}{key}.npy"] = array
+
+        for name, array in files.items():
+            with open(os.path.join(path, tmp(name)), "wb") as f:
+                np.save(f, array, allow_pickle=False)
+        with open(os.path.join(path, tmp(TEXTS_FILE)), "wb") as f:
+            f.write(b"".join(encoded))
+        with open(os.path.join(path, tmp(COLUMNS_FILE)), "w", encoding="utf-8") as f:
+            json.dump(columns, f, ensure_ascii=False)
+        for name in [*files, TEXTS_FILE, COLUMNS_FILE]:
+            os.replace(os.path.join(path, tmp(name)), os.path.join(path, name))
+
+    # --- mapping ---------------------------------------------------------
+
+    def _row(self, chunk_id: int) -> int:
+        row = int(np.searchsorted(self._ids, chunk_id))
+        if row < len(self._ids) and self._ids[row] == chunk_id and chunk_id not in self._removed:
+            return row
+        return -1
+
+    def _decode(self, row: int, chunk_id: int) -> Tuple[str, dict]:
+        text = self._texts[self._offsets[row]:self._offsets[row + 1]].tobytes().decode("utf-8")
+        metadata = {}
+        for name, (kind, array, table) in self._columns.items():
+            value = array[row]
+            if kind == "int":
+                if value != MISSING_INT:
+                    metadata[name] = int(value)
+            elif kind == "float":
+                if not np.isnan(value):
+                    metadata[name] = float(value)
+            elif value >= 0:
+                metadata[name] = table[value]
+        metadata["chunk_id"] = chunk_id
+        return text, metadata
+
+    def __getitem__(self, chunk_id: int) -> Tuple[str, dict]:
+        chunk = self._added.get(chunk_id)
+        if chunk is not None:
+            return chunk
+        row = self._row(chunk_id)
+        if row < 0:
+            raise KeyError(chunk_id)
+        return self._decode(row, chunk_id)
+
+    def __contains__(self, chunk_id) -> bool:
+        return chunk_id in self._added or self._row(chunk_id) >= 0
+
+    def __setitem__(self, chunk_id: int, chunk: Tuple[str, dict]):
+        if self._row(chunk_id) >= 0:
+            self._removed.add(chunk_id)
+        self._added[chunk_id] = chunk
+
+    def __delitem__(self, chunk_id: int):
+        if chunk_id in self._added:
+            del self._added[chunk_id]
+        elif self._row(chunk_id) >= 0:
+            self._removed.add(chunk_id)
+        else:
+            raise KeyError(chunk_id)
+
+    def __iter__(self) -> Iterator[int]:
+        for chunk_id in self._ids.tolist():
+            if chunk_id not in self._removed:
+                yield chunk_id
+        yield from list(self._added)
+
+    def __len__(self) -> int:
+        return len(self._ids) - len(self._removed) + len(self._added)
+
+    def ids_where(self, filters: Dict[str, object]) -> list:
+        """
+        Ids of chunks whose metadata equals every {key: value} in `filters`,
+        evaluated on the columns without decoding any chunk.
+        """
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, value in filters.items():
+            if key == "chunk_id":
+                mask &= np.asarray(self._ids) == value
+                continue
+            column = self._columns.get(key)
+            if column is None:
+                mask[:] = False
+                break
+            kind, array, table = column
+            if kind == "str":
+                code = table.index(value) if isinstance(value, str) and value in table else -2
+                mask &= np.asarray(array) == code
+            else:
+                mask &= np.asarray(array) == value
+        ids = [chunk_id for chunk_id in np.asarray(self._ids)[mask].tolist() if chunk_id not in self._removed]
+        ids.extend(
+            chunk_id for chunk_id, (_, metadata) in self._added.items()
+            if all(metadata.get(key) == value for key, value in filters.items())
+        )
+        return ids
@@ -0,0 +1,82 @@
+# chunker.py
+import bisect
+import re
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 200
+
+# Preferred split points, strongest first (same order as the recursive splitter)
+SEPARATORS = ("\n\n", "\n", " ")
+
+_WHITESPACE = re.compile(r"\s")
+_NON_WHITESPACE = re.compile(r"\S")
+
+
+def _skip_whitespace(text, pos, end):
+    match = _NON_WHITESPACE.search(text, pos, end)
+    return match.start() if match else end
+
+
+def chunk_spans(text, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, start=0, end=None):
+    """
+    Splits text[start:end] into overlapping chunks without copying it.
+    Returns a list of (start, end) offsets into `text`. Each chunk is at most
+    `chunk_size` characters, ends on the strongest separator available
+    (paragraph, line, then word) and the next chunk starts on a word boundary
+    up to `chunk_overlap` characters before it.
+    """
+    end = len(text) if end is None else end
+    spans = []
+    pos = _skip_whitespace(text, start, end)
+
+    while pos < end:
+        limit = pos + chunk_size
+        if limit >= end:
+            stop = end
+        else:
+            stop = limit
+            # Only accept a separator in the back half of the window (and never
+            # inside the overlap) so chunks stay close to `chunk_size`
+            lower = pos + max(chunk_size // 2, chunk_overlap + 1)
+            for sep in SEPARATORS:
+                cut = text.rfind(sep, lower, limit)
+                if cut != -1:
+                    stop = cut
+                    break
+
+        chunk_end = stop
+        while chunk_end > pos and text[chunk_end - 1].isspace():
+            chunk_end -= 1
+        if chunk_end > pos:
+            spans.append((pos, chunk_end))
+        if stop >= end:
+            break
+
+        # Start the next chunk at the first word boundary inside the overlap
+        match = _WHITESPACE.search(text, max(stop - chunk_overlap, pos + 1), stop)
+        pos = _skip_whitespace(text, match.end() if match else stop, end)
+
+    return spans
+
+
+def annotate_spans(spans, page_offsets, sections=None):
+    """
+    Attaches page range and section name metadata to (start, end) spans.
+    `page_offsets` holds the offset where each page starts (page 1 first);
+    `sections` is a {name: [start, end]} table as built by section_index.
+    Returns a list of (start, end, metadata).
+    """
+    ordered = sorted((span[0], span[1], name) for name, span in (sections or {}).items())
+    section_starts = [s for s, _, _ in ordered]
+
+    annotated = []
+    for start, end in spans:
+        metadata = {
+            "page_start": bisect.bisect_right(page_offsets, start),
+            "page_end": bisect.bisect_right(page_offsets, max(start, end - 1)),
+        }
+        i = bisect.bisect_right(section_starts, start) - 1
+        if i >= 0 and start < ordered[i][1]:
+            metadata["section"] = ordered[i][2]
+        annotated.append((start, end, metadata))
+    return annotated
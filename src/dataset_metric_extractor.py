@@ -1,62 +1,751 @@
 # gemini_dataset_metric_extractor.py
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
-from dotenv import load_dotenv
+import json
 import os
-import time
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Sequence, Tuple
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+import pandas as pd
 
-def extract_datasets_and_metrics_with_gemini(paper_text: str, max_retries=3) -> str:
+from src.llm_backends import LLMTimeoutError, RateLimitError
+from src.llm_client import LLM_MAX_CONCURRENCY, CircuitOpenError, get_llm_client
+from src.term_matcher import TermMatcher
+
+# Papers extracted at once by extract_many()
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+
+# Shape of the model's answer; passed to the backend as a response schema
+EXTRACTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "datasets": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "domain": {"type": "string"},
+                    "usage": {"type": "string"},
+                    "quote": {"type": "string"},
+                    "inferred": {"type": "boolean"},
+                },
+                "required": ["name", "domain", "usage", "quote", "inferred"],
+            },
+        },
+        "metrics": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "purpose": {"type": "string"},
+                    "quote": {"type": "string"},
+                    "inferred": {"type": "boolean"},
+                },
+                "required": ["name", "purpose", "quote", "inferred"],
+            },
+        },
+    },
+    "required": ["datasets", "metrics"],
+}
+
+
+@dataclass
+class DatasetRecord:
+    paper: str
+    name: str
+    domain: str = ""
+    usage: str = ""
+    quote: str = ""
+    inferred: bool = False
+
+
+@dataclass
+class MetricRecord:
+    paper: str
+    name: str
+    purpose: str = ""
+    quote: str = ""
+    inferred: bool = False
+
+
+@dataclass
+class PaperExtraction:
     """
-    Uses Gemini 2.5 Flash to infer datasets and evaluation metrics mentioned in a paper.
-    Returns a structured Markdown report (tables).
+    Datasets and metrics found in one paper. `note` explains an empty
+    result (e.g. "No text provided.").
     """
-    if not paper_text or len(paper_text.strip()) < 200:
-        return "No text provided."
+    paper: str
+    datasets: List[DatasetRecord] = field(default_factory=list)
+    metrics: List[MetricRecord] = field(default_factory=list)
+    note: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PaperExtraction":
+        return cls(
+            paper=data.get("paper", ""),
+            datasets=[DatasetRecord(**record) for record in data.get("datasets", [])],
+            metrics=[MetricRecord(**record) for record in data.get("metrics", [])],
+            note=data.get("note", ""),
+        )
+
+    def to_markdown(self) -> str:
+        """
+        The two tables the extractor has always shown.
+        """
+        if self.note and not (self.datasets or self.metrics):
+            return self.note
+        lines = ["### 📊 Datasets"]
+        if self.datasets:
+            lines += ["| Dataset Name | Domain/Type | Usage Context | Example Mention (short quote) |",
+                      "|---|---|---|---|"]
+            lines += [
+                f"| {_cell(d.name)}{' *(inferred)*' if d.inferred else ''} | {_cell(d.domain)} "
+                f"| {_cell(d.usage)} | {_cell(d.quote)} |"
+                for d in self.datasets
+            ]
+        else:
+            lines.append("No datasets detected.")
+        lines += ["", "### 📏 Metrics"]
+        if self.metrics:
+            lines += ["| Metric Name | Purpose / What It Measures | Example Mention (short quote) |",
+                      "|---|---|---|"]
+            lines += [
+                f"| {_cell(m.name)}{' *(inferred)*' if m.inferred else ''} | {_cell(m.purpose)} | {_cell(m.quote)} |"
+                for m in self.metrics
+            ]
+        else:
+            lines.append("No metrics detected.")
+        return "\n".join(lines)
+
+
+def _cell(text: str) -> str:
+    return " ".join(str(text).split()).replace("|", "\\|")
 
-    prompt = f"""
+
+def normalize_name(name: str) -> str:
+    """
+    Key under which spellings of one name are merged: "ImageNet-1k",
+    "imagenet 1K" and "ImageNet1k" all become "imagenet1k".
+    """
+    return re.sub(r"[^0-9a-z]+", "", str(name).lower())
+
+
+_ANSWER_FORMAT = """Answer with a JSON object with two lists:
+- "datasets": objects with "name", "domain" (domain/type), "usage" (usage context),
+  "quote" (short example mention) and "inferred"
+- "metrics": objects with "name", "purpose" (what it measures), "quote" and "inferred"
+
+Set "inferred" to true when a dataset or metric is only implied.
+Use empty lists when none are found."""
+
+
+def _extraction_prompt(paper_text: str) -> str:
+    return f"""
 You are an expert AI research assistant.
 Read the following research paper text carefully and extract both:
 1. **Datasets** used, mentioned, or implied.
 2. **Evaluation metrics** or performance measures mentioned.
 
-For each, produce two clear Markdown tables with the following columns:
+{_ANSWER_FORMAT}
 
-### 📊 Datasets
-| Dataset Name | Domain/Type | Usage Context | Example Mention (short quote) |
+Paper text:
+{paper_text}
 
-### 📏 Metrics
-| Metric Name | Purpose / What It Measures | Example Mention (short quote) |
+Respond only with the JSON object — no extra commentary.
+"""
 
-If any dataset or metric is only implied, mark it with *(inferred)*.
-If none are found, explicitly say "No datasets detected." or "No metrics detected."
 
-Paper text:
-{paper_text[:12000]}
+def _verification_prompt(candidates: str, passages: str) -> str:
+    return f"""
+You are an expert AI research assistant.
+A keyword scan of a research paper found these candidate datasets and metrics:
+{candidates}
+
+Below are the passages around those mentions. Using only these passages, extract both:
+1. **Datasets** used, mentioned, or implied.
+2. **Evaluation metrics** or performance measures mentioned.
+Drop candidates that are not really a dataset or metric here (e.g. a common word),
+and add any other dataset or metric the passages name.
 
-Respond only with Markdown tables and brief headers — no extra commentary.
+{_ANSWER_FORMAT}
+
+Passages:
+{passages}
+
+Respond only with the JSON object — no extra commentary.
 """
 
-    for attempt in range(max_retries):
-        try:
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            response = model.generate_content(prompt)
-            return response.text
-        except (google_exceptions.ResourceExhausted, google_exceptions.DeadlineExceeded) as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
-                continue
-            else:
-                raise Exception(
-                    "⚠️ Gemini API is currently overloaded. Please try again in a few moments."
-                ) from e
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
+
+def _parse_json(text: str) -> dict:
+    # Models without schema support may still wrap the object in a code fence
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("no JSON object in the response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("the response is not a JSON object")
+    return data
+
+
+def _records(items, cls, paper: str, fields: Sequence[str]) -> list:
+    records, seen = [], set()
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        name = " ".join(str(item.get("name") or "").split())
+        key = normalize_name(name)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        values = {f: " ".join(str(item.get(f) or "").split()) for f in fields}
+        records.append(cls(paper=paper, name=name, inferred=item.get("inferred") is True, **values))
+    return records
+
+
+def parse_extraction(text: str, paper: str = "") -> PaperExtraction:
+    """
+    PaperExtraction from the model's JSON answer. Malformed entries are
+    skipped and duplicate names (after normalize_name) kept once.
+    """
+    data = _parse_json(text)
+    return PaperExtraction(
+        paper=paper,
+        datasets=_records(data.get("datasets"), DatasetRecord, paper, ("domain", "usage", "quote")),
+        metrics=_records(data.get("metrics"), MetricRecord, paper, ("purpose", "quote")),
+    )
+
+
+# === Known-name pre-scan ===
+
+# Canonical name -> (domain, aliases). Extend with EXTRACT_LEXICON_PATH.
+DATASET_LEXICON = {
+    "ImageNet": ("Image classification", ("ImageNet-1k", "ImageNet1k", "ILSVRC", "ILSVRC-2012", "ILSVRC2012")),
+    "ImageNet-21k": ("Image classification", ("ImageNet-22k",)),
+    "CIFAR-10": ("Image classification", ("CIFAR10",)),
+    "CIFAR-100": ("Image classification", ("CIFAR100",)),
+    "MNIST": ("Image classification", ()),
+    "Fashion-MNIST": ("Image classification", ("FashionMNIST",)),
+    "SVHN": ("Image classification", ()),
+    "COCO": ("Object detection / segmentation", ("MS COCO", "MSCOCO", "COCO 2017")),
+    "PASCAL VOC": ("Object detection / segmentation", ("VOC 2007", "VOC 2012", "VOC2007", "VOC2012")),
+    "LVIS": ("Object detection", ()),
+    "Open Images": ("Object detection", ("OpenImages",)),
+    "Cityscapes": ("Semantic segmentation", ()),
+    "ADE20K": ("Semantic segmentation", ("ADE-20K",)),
+    "KITTI": ("Autonomous driving", ()),
+    "nuScenes": ("Autonomous driving", ()),
+    "Kinetics-400": ("Video action recognition", ("Kinetics400", "Kinetics")),
+    "UCF101": ("Video action recognition", ("UCF-101",)),
+    "CelebA": ("Face images", ()),
+    "ShapeNet": ("3D shapes", ()),
+    "ScanNet": ("3D scenes", ()),
+    "LAION-5B": ("Image-text pairs", ("LAION-400M", "LAION")),
+    "Conceptual Captions": ("Image-text pairs", ("CC3M", "CC12M")),
+    "Flickr30k": ("Image captioning / retrieval", ("Flickr-30k",)),
+    "VQA v2": ("Visual question answering", ("VQAv2", "VQA 2.0")),
+    "GLUE": ("Natural language understanding", ()),
+    "SuperGLUE": ("Natural language understanding", ()),
+    "SST-2": ("Sentiment analysis", ("SST2",)),
+    "IMDb": ("Sentiment analysis", ("IMDB",)),
+    "MultiNLI": ("Natural language inference", ("MNLI",)),
+    "SNLI": ("Natural language inference", ()),
+    "CoNLL-2003": ("Named entity recognition", ("CoNLL 2003", "CoNLL03")),
+    "SQuAD": ("Question answering", ("SQuAD 1.1", "SQuAD v1.1", "SQuAD 2.0", "SQuAD v2.0", "SQuAD2.0")),
+    "Natural Questions": ("Question answering", ()),
+    "TriviaQA": ("Question answering", ()),
+    "HotpotQA": ("Question answering", ()),
+    "MS MARCO": ("Information retrieval", ("MSMARCO",)),
+    "BEIR": ("Information retrieval", ()),
+    "MMLU": ("LLM evaluation", ()),
+    "HellaSwag": ("LLM evaluation", ()),
+    "TruthfulQA": ("LLM evaluation", ()),
+    "BIG-bench": ("LLM evaluation", ("BIG-Bench",)),
+    "GSM8K": ("Math reasoning", ()),
+    "MATH": ("Math reasoning", ()),
+    "HumanEval": ("Code generation", ()),
+    "MBPP": ("Code generation", ()),
+    "WMT": ("Machine translation", ("WMT14", "WMT16", "WMT19", "WMT 2014")),
+    "IWSLT": ("Machine translation", ()),
+    "CNN/DailyMail": ("Summarization", ("CNN/Daily Mail", "CNN-DM", "CNN/DM")),
+    "XSum": ("Summarization", ()),
+    "Penn Treebank": ("Language modeling", ("PTB",)),
+    "WikiText-103": ("Language modeling", ("WikiText103",)),
+    "WikiText-2": ("Language modeling", ("WikiText2",)),
+    "The Pile": ("Language modeling", ()),
+    "C4": ("Language modeling", ()),
+    "Common Crawl": ("Web text", ("CommonCrawl",)),
+    "LibriSpeech": ("Speech recognition", ()),
+    "Common Voice": ("Speech recognition", ()),
+    "TIMIT": ("Speech recognition", ()),
+    "AudioSet": ("Audio classification", ()),
+    "MIMIC-III": ("Clinical records", ("MIMIC-IV", "MIMIC")),
+    "PubMed": ("Biomedical text", ()),
+    "Cora": ("Graph learning", ()),
+    "CiteSeer": ("Graph learning", ()),
+    "OGB": ("Graph learning", ("Open Graph Benchmark",)),
+    "MovieLens": ("Recommendation", ("MovieLens-1M", "ML-1M")),
+    "Atari": ("Reinforcement learning", ("Atari 2600", "Arcade Learning Environment")),
+    "MuJoCo": ("Reinforcement learning", ()),
+    "D4RL": ("Offline reinforcement learning", ()),
+}
+
+# Canonical name -> (what it measures, aliases)
+METRIC_LEXICON = {
+    "Accuracy": ("Share of correct predictions", ()),
+    "Top-1 Accuracy": ("Share of inputs whose top prediction is correct", ("top-1 acc",)),
+    "Top-5 Accuracy": ("Share of inputs with the label among the top 5 predictions", ("top-5 acc",)),
+    "Precision": ("Share of positive predictions that are correct", ()),
+    "Recall": ("Share of positives that are found", ()),
+    "F1": ("Harmonic mean of precision and recall", ("F1 score", "F-score", "F-measure")),
+    "AUC": ("Area under the ROC curve", ("ROC-AUC", "AUROC", "AUC-ROC")),
+    "AUPRC": ("Area under the precision-recall curve", ("PR-AUC", "AUPR")),
+    "mAP": ("Mean average precision over classes", ("mean average precision", "AP50", "AP@50", "mAP@0.5")),
+    "IoU": ("Overlap between predicted and true regions", ("mIoU", "mean IoU", "intersection over union")),
+    "Dice": ("Overlap between predicted and true segmentation", ("Dice coefficient", "Dice score")),
+    "BLEU": ("N-gram overlap with reference translations", ("BLEU-4", "SacreBLEU")),
+    "ROUGE": ("N-gram overlap with reference summaries", ("ROUGE-1", "ROUGE-2", "ROUGE-L")),
+    "METEOR": ("Alignment with reference texts, synonyms included", ()),
+    "CIDEr": ("Consensus with reference captions", ()),
+    "BERTScore": ("Embedding similarity to reference texts", ()),
+    "Perplexity": ("How well a language model predicts text", ("PPL",)),
+    "Exact Match": ("Share of answers identical to the reference", ()),
+    "Word Error Rate": ("Word-level transcription errors", ("WER",)),
+    "Character Error Rate": ("Character-level transcription errors", ("CER",)),
+    "FID": ("Distance between generated and real image distributions", ("Frechet Inception Distance", "Fréchet Inception Distance")),
+    "Inception Score": ("Quality and diversity of generated images", ()),
+    "PSNR": ("Reconstruction fidelity in decibels", ("peak signal-to-noise ratio",)),
+    "SSIM": ("Perceived structural similarity of images", ("structural similarity",)),
+    "LPIPS": ("Learned perceptual image similarity", ()),
+    "MSE": ("Mean squared error", ("mean squared error",)),
+    "RMSE": ("Root mean squared error", ("root mean squared error", "root mean square error")),
+    "MAE": ("Mean absolute error", ("mean absolute error",)),
+    "R²": ("Share of variance explained", ("R^2", "coefficient of determination")),
+    "NDCG": ("Ranking quality weighted by position", ("nDCG", "NDCG@10")),
+    "MRR": ("Mean reciprocal rank of the first relevant result", ("MRR@10", "mean reciprocal rank")),
+    "Recall@k": ("Share of relevant items in the top k results", ("Recall@1", "Recall@5", "Recall@10", "R@1", "R@5", "R@10")),
+    "Pass@k": ("Share of problems solved within k samples", ("pass@1", "pass@10", "pass@100")),
+    "Spearman Correlation": ("Rank correlation with reference scores", ("Spearman's rho", "Spearman")),
+    "Matthews Correlation": ("Binary classification quality under class imbalance", ("MCC", "Matthews correlation coefficient")),
+    "Expected Calibration Error": ("Gap between confidence and accuracy", ("ECE",)),
+    "Success Rate": ("Share of tasks or episodes completed", ()),
+    "Average Return": ("Mean episode reward", ("average reward", "episode return", "cumulative reward")),
+    "Latency": ("Time per input at inference", ("inference time",)),
+    "Throughput": ("Inputs processed per unit of time", ()),
+    "FLOPs": ("Compute cost of a model", ("GFLOPs",)),
+}
+
+# Names that are also everyday English ("we recall that...", "the precision
+# of the method"). "scan" lets the LLM judge them; "fast" only counts a
+# mention with a reported value next to it (see _has_value).
+COMMON_WORD_NAMES = frozenset({
+    "Accuracy", "Precision", "Recall", "Dice", "Exact Match", "Success Rate",
+    "Average Return", "Latency", "Throughput",
+})
+# A decimal or a percentage
+_VALUE = re.compile(r"\d*\.\d+|\d+(?:\.\d+)?\s*%")
+# How far from a common-word mention its value may be, in characters
+VALUE_DISTANCE = 40
+
+# JSON file with more entries, same shape as the built-in lexicon
+# ("common_word": true marks an entry like those in COMMON_WORD_NAMES):
+# {"datasets": {"Name": {"domain": "...", "aliases": [...]}},
+#  "metrics": {"Name": {"purpose": "...", "aliases": [...], "common_word": false}}}
+LEXICON_PATH = os.getenv("EXTRACT_LEXICON_PATH")
+# Characters of context kept on each side of a mention sent to the LLM
+CONTEXT_CHARS = int(os.getenv("EXTRACT_CONTEXT_CHARS", "240"))
+# Passages per name: the first few mentions say how it is used, the rest repeat it
+MAX_WINDOWS_PER_NAME = int(os.getenv("EXTRACT_WINDOWS_PER_NAME", "3"))
+
+# "full": the paper's text goes to the LLM. "scan": only the passages around
+# known names do, for the LLM to verify and complete (the full text when no
+# known name is found). "fast": the matches are the result, no LLM call.
+EXTRACT_MODES = ("full", "scan", "fast")
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "scan")
+
+
+def _reads_as_words(term: str) -> bool:
+    """
+    Whether `term` could be ordinary prose once lower-cased: no digit and
+    no inner capital ("CIFAR-10", "ImageNet" and "nuScenes" cannot).
+    """
+    if any(c.isdigit() for c in term):
+        return False
+    words = re.split(r"[\s\-_/]+", term)
+    return not any(any(c.isupper() for c in word[1:]) and any(c.islower() for c in word) for word in words)
+
+
+@dataclass
+class Mention:
+    kind: str  # "datasets" or "metrics"
+    name: str  # canonical name
+    start: int
+    end: int
+
+
+class Lexicon:
+    """
+    Known dataset and metric names with their aliases, all matched in one
+    pass over a paper by a TermMatcher (see term_matcher.py). Each name
+    carries a detail: a dataset's domain or what a metric measures.
+    """
+
+    def __init__(self, datasets=DATASET_LEXICON, metrics=METRIC_LEXICON):
+        self.details = {}  # (kind, name) -> detail
+        self.common = set()  # (kind, name) of COMMON_WORD_NAMES-like entries
+        self.matcher = TermMatcher()
+        for name, (domain, aliases) in datasets.items():
+            self.add("datasets", name, domain, aliases, common_word=name in COMMON_WORD_NAMES)
+        for name, (purpose, aliases) in metrics.items():
+            self.add("metrics", name, purpose, aliases, common_word=name in COMMON_WORD_NAMES)
+
+    def add(self, kind: str, name: str, detail: str = "", aliases: Sequence[str] = (), common_word: bool = False):
+        self.details[(kind, name)] = detail
+        if common_word:
+            self.common.add((kind, name))
+        else:
+            self.common.discard((kind, name))
+        for term in (name, *aliases):
+            # Dataset names that read as words ("Kinetics", "MIMIC", "The Pile")
+            # must keep their casing; the rest follow the matcher's default
+            exact = kind == "datasets" and _reads_as_words(term)
+            self.matcher.add(term, (kind, name), case_sensitive=True if exact else None)
+
+    def load(self, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for kind, detail_key in (("datasets", "domain"), ("metrics", "purpose")):
+            for name, entry in (data.get(kind) or {}).items():
+                self.add(kind, name, entry.get(detail_key, ""), entry.get("aliases", ()),
+                         common_word=entry.get("common_word") is True)
+
+    def scan(self, text: str) -> List[Mention]:
+        return [Mention(kind, name, start, end) for start, end, (kind, name) in self.matcher.find(text)]
+
+
+_lexicon: Optional[Lexicon] = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> Lexicon:
+    """
+    Process-wide lexicon: the built-in names plus EXTRACT_LEXICON_PATH.
+    """
+    global _lexicon
+    with _lexicon_lock:
+        if _lexicon is None:
+            lexicon = Lexicon()
+            if LEXICON_PATH:
+                try:
+                    lexicon.load(LEXICON_PATH)
+                except (OSError, ValueError, AttributeError) as e:
+                    print("Could not load the dataset/metric lexicon:", e)
+            _lexicon = lexicon
+        return _lexicon
+
+
+def _window(text: str, start: int, end: int, chars: int) -> Tuple[int, int]:
+    # Widened by `chars` each way, then out to the nearest whitespace
+    left = max(start - chars, 0)
+    right = min(end + chars, len(text))
+    if left:
+        left = max(text.rfind(" ", 0, left), text.rfind("\n", 0, left)) + 1
+    right = min((i for i in (text.find(" ", right), text.find("\n", right)) if i >= 0), default=len(text))
+    return left, right
+
+
+def context_windows(text: str, mentions: Sequence[Mention], chars: int = CONTEXT_CHARS,
+                    per_name: int = MAX_WINDOWS_PER_NAME) -> List[Tuple[int, int]]:
+    """
+    (start, end) spans around the first `per_name` mentions of each name,
+    overlapping spans merged, in text order.
+    """
+    spans, seen = [], Counter()
+    for mention in mentions:
+        seen[mention.kind, mention.name] += 1
+        if seen[mention.kind, mention.name] <= per_name:
+            spans.append(_window(text, mention.start, mention.end, chars))
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _has_value(text: str, mention: Mention) -> bool:
+    # "accuracy of 76.5%", "0.91 precision": a number within VALUE_DISTANCE,
+    # not crossing a sentence end
+    before = text[max(mention.start - VALUE_DISTANCE, 0):mention.start]
+    after = text[mention.end:mention.end + VALUE_DISTANCE]
+    before = re.split(r"[.!?]\s", before)[-1]
+    after = re.split(r"[.!?]\s", after)[0]
+    return bool(_VALUE.search(before) or _VALUE.search(after))
+
+
+def extraction_from_mentions(text: str, mentions: Sequence[Mention], paper: str = "",
+                             lexicon: Optional[Lexicon] = None) -> PaperExtraction:
+    """
+    PaperExtraction straight from the scan, without the LLM: each known name
+    found, its lexicon domain/purpose, its mention count and the first
+    mention as the quote. Common-word names count only where a value is
+    reported next to them.
+    """
+    lexicon = lexicon or get_lexicon()
+    first, counts = {}, Counter()
+    for mention in mentions:
+        if (mention.kind, mention.name) in lexicon.common and not _has_value(text, mention):
+            continue
+        counts[mention.kind, mention.name] += 1
+        first.setdefault((mention.kind, mention.name), mention)
+    extraction = PaperExtraction(paper=paper)
+    for (kind, name), mention in first.items():
+        left, right = _window(text, mention.start, mention.end, 60)
+        quote = " ".join(text[left:right].split())
+        detail = lexicon.details.get((kind, name), "")
+        if kind == "datasets":
+            usage = f"Mentioned {counts[kind, name]} time(s)"
+            extraction.datasets.append(DatasetRecord(paper, name, domain=detail, usage=usage, quote=quote))
+        else:
+            extraction.metrics.append(MetricRecord(paper, name, purpose=detail, quote=quote))
+    return extraction
+
+
+def _paper_string(paper_text) -> str:
+    if isinstance(paper_text, str):
+        return paper_text
+    return "\n\n".join(text for _, text in paper_text)
+
+
+def _prompt(paper_text, mode: str, paper: str) -> Tuple[Optional[str], Optional[PaperExtraction]]:
+    # The prompt to send, or the finished result when no LLM call is needed
+    if mode != "full":
+        text = _paper_string(paper_text)
+        if len(text.strip()) < 200:
+            return None, PaperExtraction(paper=paper, note="No text provided.")
+        mentions = get_lexicon().scan(text)
+        if mode == "fast":
+            return None, extraction_from_mentions(text, mentions, paper)
+        if mentions:
+            names = {(mention.kind, mention.name): None for mention in mentions}
+            candidates = "\n".join(f"- {name} ({kind[:-1]})" for kind, name in names)
+            passages = "\n...\n".join(
+                " ".join(text[start:end].split()) for start, end in context_windows(text, mentions)
+            )
+            passages = get_llm_client().budget("extract").fit(passages, _verification_prompt(candidates, ""))
+            return _verification_prompt(candidates, passages), None
+        # Nothing known in the paper: let the model read it
+
+    if not isinstance(paper_text, str):
+        paper_text = [("", paper_text)]
+    paper_text = get_llm_client().budget("extract").fill(paper_text, _extraction_prompt(""))
+    if not paper_text or len(paper_text.strip()) < 200:
+        return None, PaperExtraction(paper=paper, note="No text provided.")
+    return _extraction_prompt(paper_text), None
+
+
+def extract_datasets_and_metrics_with_gemini(paper_text, max_retries=None, paper: str = "",
+                                              mode: Optional[str] = None) -> PaperExtraction:
+    """
+    Uses Gemini 2.5 Flash to infer datasets and evaluation metrics mentioned in a paper.
+    `paper_text` is a string or the paper's [(section, text)] list (see
+    pdf_loader.extract_sections). `mode` is one of EXTRACT_MODES (default
+    EXTRACT_MODE): "full" fits the text into the "extract" token budget,
+    "scan" sends only the passages around known names, "fast" makes no
+    LLM call. Returns a PaperExtraction (to_markdown() gives the familiar tables).
+    """
+    mode = mode or EXTRACT_MODE
+    if mode not in EXTRACT_MODES:
+        raise ValueError(f"Unknown extraction mode: {mode} (expected one of {', '.join(EXTRACT_MODES)})")
+    prompt, extraction = _prompt(paper_text, mode, paper)
+    if extraction is not None:
+        return extraction
+
+    try:
+        answer = get_llm_client().generate(prompt, max_retries=max_retries, json_schema=EXTRACTION_SCHEMA)
+    except CircuitOpenError:
+        raise
+    except (RateLimitError, LLMTimeoutError) as e:
+        raise Exception(
+            "⚠️ Gemini API is currently overloaded. Please try again in a few moments."
+        ) from e
+    except Exception as e:
+        raise Exception(f"⚠️ Error extracting datasets/metrics: {str(e)}") from e
+
+    try:
+        return parse_extraction(answer, paper)
+    except ValueError as e:
+        raise Exception(f"⚠️ Could not read the extracted datasets/metrics: {str(e)}") from e
+
+
+def extract_many(papers, max_workers=EXTRACT_CONCURRENCY, mode: Optional[str] = None):
+    """
+    Runs extract_datasets_and_metrics_with_gemini over many papers at once.
+    `papers` is a list of (name, paper_text) pairs, all extracted in `mode`. Yields
+    (index, name, result, error) as each paper finishes, in completion
+    order; `error` is None on success, otherwise the failure message, and a
+    failed paper never stops the others. Calls share the LLM client's rate
+    limits and concurrency cap, so `max_workers` only bounds the threads
+    waiting on them.
+    """
+    if not papers:
+        return
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(papers))))
+    try:
+        futures = {
+            pool.submit(extract_datasets_and_metrics_with_gemini, text, paper=name, mode=mode): (index, name)
+            for index, (name, text) in enumerate(papers)
+        }
+        for future in as_completed(futures):
+            index, name = futures[future]
+            try:
+                yield index, name, future.result(), None
+            except Exception as e:
+                yield index, name, None, str(e)
+    finally:
+        # Also reached when the caller stops early: drop papers not yet started
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# === Cross-paper summary (local, no LLM call) ===
+
+def _frame(extractions: Sequence[PaperExtraction], kind: str) -> pd.DataFrame:
+    rows = [asdict(record) for extraction in extractions for record in getattr(extraction, kind)]
+    frame = pd.DataFrame(rows, columns=["paper", "name", "domain" if kind == "datasets" else "purpose", "inferred"])
+    frame["key"] = frame["name"].map(normalize_name)
+    return frame
+
+
+def _display_names(frame: pd.DataFrame) -> pd.Series:
+    # Most common spelling of each name; ties go to the first seen
+    return frame.groupby("key", sort=False)["name"].agg(lambda names: names.value_counts().index[0])
+
+
+def _frequency(frame: pd.DataFrame, detail: str) -> pd.DataFrame:
+    if frame.empty:
+        return pd.DataFrame(columns=["name", "papers", "share", detail, "key"])
+    table = frame.groupby("key", sort=False).agg(
+        papers=("paper", "nunique"),
+        **{detail: (detail, lambda values: _most_common(values))},
+    )
+    table["name"] = _display_names(frame)
+    table["share"] = table["papers"] / frame["paper"].nunique()
+    table = table.reset_index().sort_values(["papers", "name"], ascending=[False, True], kind="stable")
+    return table[["name", "papers", "share", detail, "key"]].reset_index(drop=True)
+
+
+def _most_common(values: pd.Series) -> str:
+    values = values[values.str.len() > 0]
+    return values.value_counts().index[0] if len(values) else ""
+
+
+class ExtractionSummary:
+    """
+    What the per-paper extractions add up to, computed with pandas:
+    dataset and metric frequencies (papers using each, most common
+    domain/purpose), domain counts, datasets shared across papers and
+    which datasets and metrics appear in the same papers. Records do not
+    say which metric was measured on which dataset, so a pair only means
+    both occur in a paper.
+    """
+
+    def __init__(self, extractions: Sequence[PaperExtraction]):
+        self.extractions = list(extractions)
+        self.papers = len(self.extractions)
+        datasets = _frame(self.extractions, "datasets")
+        metrics = _frame(self.extractions, "metrics")
+        self.datasets = _frequency(datasets, "domain")
+        self.metrics = _frequency(metrics, "purpose")
+
+        domains = datasets.assign(domain=datasets["domain"].replace("", "Unspecified"))
+        self.domains = (
+            domains.groupby("domain")["paper"].nunique().rename("papers")
+            .sort_values(ascending=False, kind="stable").reset_index()
+        )
+        self.shared = self.datasets[self.datasets["papers"] >= 2].reset_index(drop=True)
+
+        # Dataset x metric: in how many papers the two appear together
+        pairs = datasets[["paper", "key"]].drop_duplicates().merge(
+            metrics[["paper", "key"]].drop_duplicates(), on="paper", suffixes=("_dataset", "_metric")
+        )
+        if pairs.empty:
+            self.pairs = pd.DataFrame(columns=["dataset", "metric", "papers"])
+        else:
+            counts = pairs.groupby(["key_dataset", "key_metric"])["paper"].nunique().rename("papers").reset_index()
+            counts["dataset"] = counts["key_dataset"].map(_display_names(datasets))
+            counts["metric"] = counts["key_metric"].map(_display_names(metrics))
+            self.pairs = (
+                counts.sort_values(["papers", "dataset", "metric"], ascending=[False, True, True], kind="stable")
+                [["dataset", "metric", "papers"]].reset_index(drop=True)
+            )
+
+    def insights(self) -> str:
+        """
+        A few plain sentences on the counts above.
+        """
+        if not (len(self.datasets) or len(self.metrics)):
+            return "No datasets or metrics were detected in these papers."
+        sentences = [
+            f"Across {self.papers} paper(s), {len(self.datasets)} distinct dataset(s) and "
+            f"{len(self.metrics)} distinct metric(s) were found."
+        ]
+        if len(self.datasets):
+            top = self.datasets.iloc[0]
+            sentences.append(f"The most used dataset is {top['name']} ({top['papers']} of {self.papers} papers).")
+        if len(self.metrics):
+            top = self.metrics.iloc[0]
+            sentences.append(f"{top['name']} is the most reported metric ({top['papers']} of {self.papers} papers).")
+        if len(self.domains):
+            top = self.domains.iloc[0]
+            sentences.append(f"{top['domain']} is the dominant dataset domain.")
+        if self.papers > 1:
+            if len(self.shared):
+                sentences.append(
+                    f"{len(self.shared)} dataset(s) are shared by two or more papers, "
+                    "so their results can be compared directly."
+                )
             else:
-                raise Exception(f"⚠️ Error extracting datasets/metrics: {str(e)}") from e
-    
-    raise Exception("⚠️ Failed to extract data after multiple retries.")
+                sentences.append("No dataset is shared between papers, so results are not directly comparable.")
+        return " ".join(sentences)
+
+    def to_markdown(self, top: int = 10) -> str:
+        lines = ["#### Top datasets"]
+        lines += _markdown_table(
+            self.datasets.head(top), ["name", "papers", "domain"], ["Dataset", "Papers", "Domain"]
+        ) or ["No datasets detected."]
+        lines += ["", "#### Top metrics"]
+        lines += _markdown_table(
+            self.metrics.head(top), ["name", "papers", "purpose"], ["Metric", "Papers", "What It Measures"]
+        ) or ["No metrics detected."]
+        if len(self.domains):
+            lines += ["", "#### Domains"]
+            lines += _markdown_table(self.domains, ["domain", "papers"], ["Domain", "Papers"])
+        if self.papers > 1:
+            lines += ["", "#### Trends across papers"]
+            if len(self.shared):
+                lines += [f"- **{row['name']}** is used by {row['papers']} papers" for _, row in self.shared.iterrows()]
+            common = self.pairs[self.pairs["papers"] >= 2].head(top)
+            lines += [
+                f"- **{row['dataset']}** and **{row['metric']}** appear together in {row['papers']} papers"
+                for _, row in common.iterrows()
+            ]
+            if not (len(self.shared) or len(common)):
+                lines.append("- No dataset or dataset/metric pairing recurs across papers.")
+        lines += ["", "#### Insight", self.insights()]
+        return "\n".join(lines)
+
+
+def _markdown_table(frame: pd.DataFrame, columns: Sequence[str], headers: Sequence[str]) -> List[str]:
+    if frame.empty:
+        return []
+    lines = ["| " + " | ".join(headers) + " |", "|" + "---|" * len(headers)]
+    lines += ["| " + " | ".join(_cell(row[c]) for c in columns) + " |" for _, row in frame.iterrows()]
+    return lines
+
@@ -0,0 +1,112 @@
+# document_store.py
+import hashlib
+import json
+import os
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+DEFAULT_STORE_DIR = os.getenv("DOC_CACHE_DIR", "doc_cache")
+DEFAULT_MAX_BYTES = int(float(os.getenv("DOC_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+
+def hash_pdf(pdf_bytes: bytes) -> str:
+    """
+    Content address of a PDF: SHA-256 hex digest of its raw bytes.
+    """
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class DocumentStore:
+    """
+    Persistent, content-addressed cache of parsed PDFs.
+    Each entry is keyed by the SHA-256 of the PDF bytes and holds the
+    extracted text, page offsets and sections, so a known paper is never
+    handed to PyMuPDF twice. Least recently used entries are evicted once
+    the store grows beyond `max_bytes`.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, doc_hash: str) -> str:
+        return os.path.join(self.store_dir, f"{doc_hash}.json")
+
+    def get(self, doc_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the stored record for `doc_hash`, or None on a miss.
+        A hit refreshes the entry's position in the LRU order.
+        """
+        path = self._path(doc_hash)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU timestamp
+        except OSError:
+            pass
+        return record
+
+    def put(self, doc_hash: str, record: Dict[str, Any]):
+        """
+        Store (or overwrite) a parsed record, then enforce the size cap.
+        """
+        path = self._path(doc_hash)
+        # Write to a unique temp file and rename so readers never see a partial entry
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.store_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.store_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            # Oldest access first
+            for _, size, name in sorted(entries):
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        for name in os.listdir(self.store_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(self.store_dir, name))
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """
+    Process-wide store shared by every app mode.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DocumentStore()
+        return _default_store
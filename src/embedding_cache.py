@@ -0,0 +1,200 @@
+# embedding_cache.py
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+DEFAULT_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+INITIAL_CAPACITY = 1024
+# The slot index is rewritten whole, so new entries are persisted at most this
+# often during a run; ingest_documents() and VectorIndex.save() flush at the end
+FLUSH_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_CACHE_FLUSH_SECONDS", "60"))
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.json"
+
+
+def hash_chunk(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class EmbeddingCache:
+    """
+    Persistent (model name, chunk hash) -> float32 vector cache.
+    Vectors live in a memory-mapped array on disk (one row per slot); a small
+    JSON index maps chunk hashes to slots and last-use ticks. Once
+    `max_entries` is reached the least recently used slots are reused.
+    New entries are persisted by flush(), which embed_documents() only
+    calls every FLUSH_INTERVAL_SECONDS; entries added since the last flush
+    are lost if the process dies, which only costs re-embedding them.
+    """
+
+    def __init__(self, model_name: str, cache_dir=DEFAULT_CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        self.model_name = model_name
+        self.dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.dim = None
+        self._vectors = None  # np.memmap of shape (capacity, dim)
+        self._slots: Dict[str, List[int]] = {}  # chunk hash -> [slot, last-use tick]
+        self._free: List[int] = []
+        self._tick = 0
+        self._dirty = False  # entries added since the last flush
+        self._last_flush = time.monotonic()
+        self._load()
+
+    # --- storage ---------------------------------------------------------
+
+    def _load(self):
+        index_path = os.path.join(self.dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            self.dim = index["dim"]
+            self._tick = index["tick"]
+            self._slots = index["slots"]
+            self._open(index["capacity"])
+        except (OSError, ValueError, KeyError):
+            # A damaged cache is just a cold cache
+            self.dim, self._vectors, self._slots, self._tick = None, None, {}, 0
+            return
+        used = {slot for slot, _ in self._slots.values()}
+        self._free = [slot for slot in range(len(self._vectors)) if slot not in used]
+
+    def _open(self, capacity: int):
+        os.makedirs(self.dir, exist_ok=True)
+        path = os.path.join(self.dir, VECTORS_FILE)
+        mode = "r+" if os.path.exists(path) else "w+"
+        if mode == "r+" and os.path.getsize(path) < capacity * self.dim * 4:
+            with open(path, "r+b") as f:
+                f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(path, dtype="float32", mode=mode, shape=(capacity, self.dim))
+
+    def _grow(self, needed: int):
+        capacity = len(self._vectors) if self._vectors is not None else 0
+        new_capacity = min(max(INITIAL_CAPACITY, capacity * 2, capacity + needed), self.max_entries)
+        if new_capacity <= capacity:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        self._open(new_capacity)
+        self._free.extend(range(capacity, new_capacity))
+
+    def _evict(self, needed: int):
+        oldest = heapq.nsmallest(needed, self._slots.items(), key=lambda item: item[1][1])
+        for chunk_hash, (slot, _) in oldest:
+            del self._slots[chunk_hash]
+            self._free.append(slot)
+
+    def flush(self):
+        """
+        Persist the slot index (vectors are written through the memmap).
+        A no-op when nothing was added since the last flush.
+        """
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if self._vectors is None or not self._dirty:
+                return
+            self._vectors.flush()
+            self._write_index()
+            self._dirty = False
+
+    def _write_index(self):
+        index = {"dim": self.dim, "capacity": len(self._vectors), "tick": self._tick, "slots": self._slots}
+        tmp_path = os.path.join(self.dir, f".{INDEX_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.dir, INDEX_FILE))
+
+    # --- lookups ---------------------------------------------------------
+
+    def get_many(self, chunk_hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Return cached vectors for the hashes that are present.
+        """
+        found = {}
+        with self._lock:
+            for chunk_hash in chunk_hashes:
+                entry = self._slots.get(chunk_hash)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._tick += 1
+                entry[1] = self._tick
+                found[chunk_hash] = np.array(self._vectors[entry[0]])
+                self.hits += 1
+        return found
+
+    def put_many(self, chunk_hashes: Sequence[str], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            new = [h for h in dict.fromkeys(chunk_hashes) if h not in self._slots]
+            if len(self._free) < len(new):
+                self._grow(len(new) - len(self._free))
+            if len(self._free) < len(new):
+                self._evict(len(new) - len(self._free))
+
+            rows = {h: i for i, h in enumerate(chunk_hashes)}
+            for chunk_hash in new[: len(self._free)]:
+                slot = self._free.pop()
+                self._tick += 1
+                self._vectors[slot] = vectors[rows[chunk_hash]]
+                self._slots[chunk_hash] = [slot, self._tick]
+                self._dirty = True
+
+    def embed_documents(self, texts: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """
+        Embed `texts`, calling `embed_fn` only for cache misses.
+        Returns a float32 array with one row per text, in input order.
+        """
+        hashes = [hash_chunk(text) for text in texts]
+        cached = self.get_many(hashes)
+
+        missing = [i for i, h in enumerate(hashes) if h not in cached]
+        if missing:
+            computed = np.asarray(embed_fn([texts[i] for i in missing]), dtype="float32")
+            self.put_many([hashes[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                cached[hashes[i]] = vector
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS:
+                self.flush()
+
+        return np.stack([cached[h] for h in hashes]).astype("float32", copy=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._slots),
+        }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    """
+    Process-wide cache instance for one embedding model.
+    """
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name)
+        return _caches[model_name]
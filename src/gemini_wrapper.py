@@ -1,21 +1,10 @@
 # gemini_wrapper.py
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
-from dotenv import load_dotenv
-import os
-import time
+from src.llm_backends import InvalidRequestError, LLMTimeoutError, RateLimitError
+from src.llm_client import CircuitOpenError, get_llm_client
 
-load_dotenv()
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-def call_gemini(prompt, context, max_retries=3, initial_delay=2):
-    """
-    Calls Gemini 2.5 Flash model with given context and question.
-    Returns the generated answer text.
-    Includes retry logic for API overload errors.
-    """
-    full_prompt = f"""
+def _qa_prompt(prompt, context):
+    return f"""
 You are a helpful AI research assistant.
 Use the following document excerpts to answer the user's question.
 Cite sources like [filename.pdf] where applicable.
@@ -29,54 +18,76 @@ Question: {prompt}
 Answer:
     """
 
-    for attempt in range(max_retries):
-        try:
-            response = genai.GenerativeModel("gemini-2.5-flash").generate_content(
-                full_prompt
-            )
-            return response.text
-            
-        except google_exceptions.ResourceExhausted as e:
-            # Model is overloaded
-            if attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)  # Exponential backoff
-                time.sleep(delay)
-                continue
-            else:
-                raise Exception(
-                    "⚠️ Gemini API is currently overloaded. Please try again in a few moments. "
-                    "If this persists, consider using a smaller document or fewer papers."
-                ) from e
-                
-        except google_exceptions.DeadlineExceeded as e:
-            # Timeout error
-            if attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)
-                time.sleep(delay)
-                continue
-            else:
-                raise Exception(
-                    "⚠️ Request timeout. The document might be too large. "
-                    "Try uploading smaller PDFs or fewer papers at once."
-                ) from e
-                
-        except google_exceptions.InvalidArgument as e:
-            # Invalid input (usually too long)
-            raise Exception(
-                "⚠️ The input is too large for the API. "
-                "Please try with shorter documents or fewer papers."
-            ) from e
-            
-        except Exception as e:
-            # Other errors
-            if attempt < max_retries - 1:
-                delay = initial_delay * (2 ** attempt)
-                time.sleep(delay)
-                continue
-            else:
-                raise Exception(
-                    f"⚠️ An error occurred while calling Gemini API: {str(e)}\n"
-                    "Please try again or contact support if the issue persists."
-                ) from e
-    
-    raise Exception("⚠️ Failed to get response after multiple retries. Please try again later.")
+def call_gemini(prompt, context, max_retries=None):
+    """
+    Calls Gemini 2.5 Flash model with given context and question.
+    Returns the generated answer text.
+    Rate limiting and retries are handled by the shared LLM client.
+    """
+    try:
+        return get_llm_client().generate(_qa_prompt(prompt, context), max_retries=max_retries)
+    except Exception as e:
+        raise _gemini_error(e) from e
+
+
+def call_gemini_stream(prompt, context, max_retries=None):
+    """
+    Streaming variant of call_gemini: yields the answer text piece by piece
+    as Gemini generates it. Retries only happen before the first piece has
+    been yielded, so callers never see duplicated text.
+    """
+    try:
+        yield from get_llm_client().stream(_qa_prompt(prompt, context), max_retries=max_retries)
+    except Exception as e:
+        raise _gemini_error(e) from e
+
+
+def _gemini_error(e):
+    """
+    User-facing exception for a Gemini failure that is not retried further.
+    """
+    if isinstance(e, CircuitOpenError):
+        return e
+    if isinstance(e, InvalidRequestError):
+        # Invalid input (usually too long)
+        return Exception(
+            "⚠️ The input is too large for the API. "
+            "Please try with shorter documents or fewer papers."
+        )
+    if isinstance(e, RateLimitError):
+        return Exception(
+            "⚠️ Gemini API is currently overloaded. Please try again in a few moments. "
+            "If this persists, consider using a smaller document or fewer papers."
+        )
+    if isinstance(e, LLMTimeoutError):
+        return Exception(
+            "⚠️ Request timeout. The document might be too large. "
+            "Try uploading smaller PDFs or fewer papers at once."
+        )
+    return Exception(
+        f"⚠️ An error occurred while calling Gemini API: {str(e)}\n"
+        "Please try again or contact support if the issue persists."
+    )
+
+
+async def call_gemini_async(prompt, context, max_retries=None):
+    """
+    Async variant of call_gemini on the asyncio Gemini client: waiting for
+    the API (and backing off between retries) never blocks the event loop.
+    """
+    try:
+        return await get_llm_client().generate_async(_qa_prompt(prompt, context), max_retries=max_retries)
+    except Exception as e:
+        raise _gemini_error(e) from e
+
+
+async def call_gemini_astream(prompt, context, max_retries=None):
+    """
+    Async streaming variant: an async generator of answer text pieces.
+    Like call_gemini_stream, retries only happen before the first piece.
+    """
+    try:
+        async for text in get_llm_client().astream(_qa_prompt(prompt, context), max_retries=max_retries):
+            yield text
+    except Exception as e:
+        raise _gemini_error(e) from e
@@ -0,0 +1,163 @@
+# ingest.py
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+# Chunks per encoder call; larger batches amortize per-call overhead
+INGEST_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+# Encoder processes; 1 keeps encoding in-process with the shared embedder
+INGEST_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+# Batches the chunker may run ahead of the encoder before it blocks
+INGEST_QUEUE_SIZE = int(os.getenv("EMBED_QUEUE_SIZE", "4"))
+
+_DONE = object()
+# Queued after a document's batches when chunking it failed partway
+_FAILED = object()
+
+logger = logging.getLogger(__name__)
+
+
+class ParallelEncoder:
+    """
+    Multi-process sentence-transformers encoder for large ingests.
+    Spreads each call over `workers` CPU processes via
+    start_multi_process_pool; exposes the same embed_documents() interface
+    as the LangChain embedder so it can be swapped in transparently.
+    """
+
+    def __init__(self, model_name: str, workers: int, batch_size: int = INGEST_BATCH_SIZE):
+        from sentence_transformers import SentenceTransformer
+
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * workers)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode_multi_process(texts, self.pool, batch_size=self.batch_size)
+
+    def close(self):
+        if self.pool is not None:
+            self.model.stop_multi_process_pool(self.pool)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _produce(documents, batch_size: int, out: queue.Queue):
+    """
+    Chunker side: groups each document's chunks into batches. put() blocks
+    when the queue is full, so chunking never runs far ahead of encoding.
+    A document that fails partway is followed by a (_FAILED, doc_hash,
+    source) marker so the consumer can drop the batches already sent.
+    """
+    try:
+        for doc_hash, source, chunks in documents:
+            batch = []
+            try:
+                for chunk in chunks:
+                    batch.append(chunk)
+                    if len(batch) >= batch_size:
+                        out.put((doc_hash, source, batch))
+                        batch = []
+            except Exception as e:
+                # One unreadable PDF should not abort the whole ingest
+                logger.warning("Skipping %s: %s", source, e)
+                out.put((_FAILED, doc_hash, source))
+                continue
+            if batch:
+                out.put((doc_hash, source, batch))
+    except Exception as e:
+        out.put(e)
+    finally:
+        out.put(_DONE)
+
+
+def _consume(out: queue.Queue) -> Iterator[Tuple[Any, ...]]:
+    while True:
+        item = out.get()
+        if item is _DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def ingest_documents(
+    db,
+    documents: Iterable[Tuple[str, str, Iterable[Tuple[str, dict]]]],
+    model_name: str = "",
+    workers: int = INGEST_WORKERS,
+    batch_size: int = INGEST_BATCH_SIZE,
+    queue_size: int = INGEST_QUEUE_SIZE,
+) -> Dict[str, Any]:
+    """
+    Embeds and adds (doc_hash, source, chunks) documents to a VectorIndex.
+    A producer thread chunks documents into a bounded queue while this
+    thread encodes batches (across `workers` processes when > 1). A
+    document whose chunking fails partway is removed again, so it is never
+    left half indexed. Returns throughput stats: chunks, seconds and
+    chunks_per_sec, plus `failed`, the hashes of the documents skipped.
+    """
+    encoder = ParallelEncoder(model_name, workers, batch_size) if workers > 1 else None
+    batches: queue.Queue = queue.Queue(maxsize=max(queue_size, 1))
+    producer = threading.Thread(target=_produce, args=(documents, batch_size, batches), daemon=True)
+
+    chunks = 0
+    failed = []
+    started = time.perf_counter()
+    try:
+        producer.start()
+        for item in _consume(batches):
+            if item[0] is _FAILED:
+                _, doc_hash, source = item
+                chunks -= db.remove_document(doc_hash)
+                failed.append(doc_hash)
+                continue
+            doc_hash, source, batch = item
+            vectors = db.embed_texts([text for text, _ in batch], encoder)
+            chunks += db.add_embedded_chunks(doc_hash, source, batch, vectors)
+    finally:
+        if encoder is not None:
+            encoder.close()
+        # Persist the new cache entries once per ingest, not once per batch
+        if getattr(db, "embedding_cache", None) is not None:
+            db.embedding_cache.flush()
+        # Unblock the producer if we bailed out early
+        while producer.is_alive():
+            try:
+                batches.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
+    seconds = time.perf_counter() - started
+    return {
+        "chunks": chunks,
+        "seconds": seconds,
+        "chunks_per_sec": chunks / seconds if seconds > 0 else 0.0,
+        "failed": failed,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.rag_pipeline import create_or_load_vectorstore
+
+    parser = argparse.ArgumentParser(description="Index a folder of PDFs into the vector store.")
+    parser.add_argument("pdf_dir")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = create_or_load_vectorstore(args.pdf_dir, workers=args.workers, batch_size=args.batch_size)
+    stats = db.ingest_stats
+    print(f"Indexed {stats['chunks']} new chunks in {stats['seconds']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/sec)")
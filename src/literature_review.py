@@ -1,21 +1,9 @@
 # literature_review.py
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
-from dotenv import load_dotenv
-import os
-import time
+from src.llm_backends import LLMTimeoutError, RateLimitError
+from src.llm_client import CircuitOpenError, get_llm_client
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-def generate_literature_review(papers_text: str, max_retries=3) -> str:
-    """
-    Generate a concise, structured literature review paragraph across multiple papers.
-    """
-    if not papers_text.strip():
-        return "No text available for review generation."
-
-    prompt = f"""
+def _review_prompt(papers_text: str) -> str:
+    return f"""
 You are a senior academic researcher.
 Given excerpts from several papers (abstracts, intros, or conclusions),
 write a **concise literature review paragraph** that:
@@ -26,27 +14,53 @@ write a **concise literature review paragraph** that:
 
 Keep it under 250 words.
 Text from papers:
-{papers_text[:16000]}
+{papers_text}
+    """
+
+def _fitted(papers_text) -> str:
+    """
+    Review input fitted into the "review" token budget; `papers_text` is a
+    string or a list of (paper name, [(section, text)]).
+    """
+    return get_llm_client().budget("review").fill(papers_text, _review_prompt(""))
+
+def generate_literature_review(papers_text, max_retries=None) -> str:
+    """
+    Generate a concise, structured literature review paragraph across multiple papers.
     """
+    papers_text = _fitted(papers_text)
+    if not papers_text.strip():
+        return "No text available for review generation."
+
+    prompt = _review_prompt(papers_text)
+
+    try:
+        return get_llm_client().generate(prompt, max_retries=max_retries)
+    except Exception as e:
+        raise _review_error(e) from e
+
+
+def stream_literature_review(papers_text, max_retries=None):
+    """
+    Streaming variant of generate_literature_review: yields the review text
+    as it is generated. Retries only happen before any text was yielded.
+    """
+    papers_text = _fitted(papers_text)
+    if not papers_text.strip():
+        yield "No text available for review generation."
+        return
+
+    prompt = _review_prompt(papers_text)
+
+    try:
+        yield from get_llm_client().stream(prompt, max_retries=max_retries)
+    except Exception as e:
+        raise _review_error(e) from e
+
 
-    for attempt in range(max_retries):
-        try:
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            response = model.generate_content(prompt)
-            return response.text
-        except (google_exceptions.ResourceExhausted, google_exceptions.DeadlineExceeded) as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
-                continue
-            else:
-                raise Exception(
-                    "⚠️ Gemini API is currently overloaded. Please try again in a few moments."
-                ) from e
-        except Exception as e:
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)
-                continue
-            else:
-                raise Exception(f"⚠️ Error generating review: {str(e)}") from e
-    
-    raise Exception("⚠️ Failed to generate review after multiple retries.")
+def _review_error(e):
+    if isinstance(e, CircuitOpenError):
+        return e
+    if isinstance(e, (RateLimitError, LLMTimeoutError)):
+        return Exception("⚠️ Gemini API is currently overloaded. Please try again in a few moments.")
+    return Exception(f"⚠️ Error generating review: {str(e)}")
@@ -0,0 +1,542 @@
+# llm_backends.py
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+# Model tiers callers ask for; each backend maps them to a concrete model
+DEFAULT_MODEL = "default"
+STRONG_MODEL = "strong"
+
+
+# --- normalized errors -------------------------------------------------------
+# Backends translate provider exceptions into these, so the retry policy and
+# the user-facing messages do not depend on which SDK is behind a call.
+
+class LLMError(Exception):
+    """
+    A failed LLM call. `retry_after` is the server-suggested wait in seconds,
+    if the provider sent one.
+    """
+
+    def __init__(self, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TransientLLMError(LLMError):
+    """
+    Worth retrying: the same request may succeed later.
+    """
+
+
+class RateLimitError(TransientLLMError):
+    pass
+
+
+class LLMTimeoutError(TransientLLMError):
+    pass
+
+
+class ServiceUnavailableError(TransientLLMError):
+    pass
+
+
+class InvalidRequestError(LLMError):
+    """
+    The request itself was rejected (too long, malformed, not authorized).
+    """
+
+
+class LLMResponse:
+    __slots__ = ("text", "total_tokens", "prompt_tokens")
+
+    def __init__(self, text: str, total_tokens: Optional[int] = None, prompt_tokens: Optional[int] = None):
+        self.text = text
+        self.total_tokens = total_tokens
+        self.prompt_tokens = prompt_tokens
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    Server-suggested wait in seconds, from RetryInfo details, a Retry-After
+    header or a "retry in 12.5s" message; None if there is no hint.
+    """
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    response = getattr(error, "response", None)
+    header = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+class LLMBackend(abc.ABC):
+    """
+    One LLM provider. generate/agenerate return an LLMResponse, stream/astream
+    yield text pieces; all of them raise LLMError subclasses for provider
+    failures. Rate limiting and retries are the caller's job (see LLMClient).
+    Every method accepts `json_schema` (a JSON Schema dict) to request JSON
+    output in that shape, via whatever the provider offers for it; where it
+    offers nothing the argument is dropped, so callers must still parse
+    leniently.
+    """
+
+    name = "base"
+    models: Dict[str, str] = {}
+
+    def resolve_model(self, model: str) -> str:
+        return self.models.get(model, model)
+
+    def translate_error(self, error: Exception) -> Exception:
+        return error
+
+    @contextmanager
+    def _translated(self):
+        # Also works around awaits, so async code paths use it too
+        try:
+            yield
+        except LLMError:
+            raise
+        except Exception as e:
+            translated = self.translate_error(e)
+            if translated is e:
+                raise
+            raise translated from e
+
+    @abc.abstractmethod
+    def generate(self, prompt: str, model: str, **kwargs) -> LLMResponse:
+        ...
+
+    @abc.abstractmethod
+    def stream(self, prompt: str, model: str, **kwargs) -> Iterator[str]:
+        ...
+
+    @abc.abstractmethod
+    async def agenerate(self, prompt: str, model: str, **kwargs) -> LLMResponse:
+        ...
+
+    @abc.abstractmethod
+    def astream(self, prompt: str, model: str, **kwargs) -> AsyncIterator[str]:
+        """
+        Implement as an async generator (`async def` with `yield`).
+        """
+
+
+def _translate_connection_error(error: Exception) -> Exception:
+    if isinstance(error, TimeoutError):
+        return LLMTimeoutError(str(error))
+    if isinstance(error, ConnectionError):
+        return ServiceUnavailableError(str(error))
+    return error
+
+
+# --- Gemini ------------------------------------------------------------------
+
+class GeminiBackend(LLMBackend):
+    """
+    google.generativeai; the SDK is configured once and model objects are
+    reused across calls.
+    """
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None):
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+        self._genai = genai
+        self._errors = google_exceptions
+        self.models = {
+            DEFAULT_MODEL: os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            STRONG_MODEL: os.getenv("GEMINI_STRONG_MODEL", "gemini-2.5-pro"),
+        }
+        self._model_objects = {}
+        self._lock = threading.Lock()
+        # JSON mode needs a newer SDK than some installs pin (0.3.x knows
+        # neither field); without it the prompt alone asks for JSON
+        try:
+            from google.ai import generativelanguage as glm
+            fields = set(glm.GenerationConfig.meta.fields)
+        except (ImportError, AttributeError):
+            fields = set()
+        self._json_mime = "response_mime_type" in fields
+        self._json_schema = self._json_mime and "response_schema" in fields
+
+    def _model(self, name: str):
+        with self._lock:
+            if name not in self._model_objects:
+                self._model_objects[name] = self._genai.GenerativeModel(name)
+            return self._model_objects[name]
+
+    def translate_error(self, error: Exception) -> Exception:
+        errors = self._errors
+        if isinstance(error, (errors.ResourceExhausted, errors.TooManyRequests)):
+            return RateLimitError(str(error), retry_after(error))
+        if isinstance(error, errors.DeadlineExceeded):
+            return LLMTimeoutError(str(error), retry_after(error))
+        if isinstance(error, (errors.ServiceUnavailable, errors.InternalServerError)):
+            return ServiceUnavailableError(str(error), retry_after(error))
+        if isinstance(error, (errors.InvalidArgument, errors.PermissionDenied, errors.Unauthenticated)):
+            return InvalidRequestError(str(error))
+        return _translate_connection_error(error)
+
+    def _options(self, kwargs) -> dict:
+        schema = kwargs.pop("json_schema", None)
+        if schema is not None and self._json_mime:
+            config = {**(kwargs.get("generation_config") or {}), "response_mime_type": "application/json"}
+            if self._json_schema:
+                config["response_schema"] = schema
+            kwargs["generation_config"] = config
+        return kwargs
+
+    @staticmethod
+    def _response(response) -> LLMResponse:
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            response.text,
+            getattr(usage, "total_token_count", None) or None,
+            getattr(usage, "prompt_token_count", None) or None,
+        )
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        # Chunks carrying only safety/finish metadata have no text
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+
+    def generate(self, prompt, model, **kwargs):
+        with self._translated():
+            return self._response(self._model(model).generate_content(prompt, **self._options(kwargs)))
+
+    def stream(self, prompt, model, **kwargs):
+        with self._translated():
+            for chunk in self._model(model).generate_content(prompt, stream=True, **self._options(kwargs)):
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+
+    async def agenerate(self, prompt, model, **kwargs):
+        with self._translated():
+            return self._response(await self._model(model).generate_content_async(prompt, **self._options(kwargs)))
+
+    async def astream(self, prompt, model, **kwargs):
+        with self._translated():
+            response = await self._model(model).generate_content_async(prompt, stream=True, **self._options(kwargs))
+            async for chunk in response:
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+
+
+# --- OpenAI-compatible -------------------------------------------------------
+
+class OpenAIBackend(LLMBackend):
+    """
+    Chat Completions API via the openai SDK. OPENAI_BASE_URL points it at any
+    compatible server (vLLM, Ollama, LM Studio, a proxy, ...).
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        import openai
+
+        options = {
+            "api_key": api_key or os.getenv("OPENAI_API_KEY") or "unused",
+            "base_url": base_url or os.getenv("OPENAI_BASE_URL") or None,
+            # LLMClient owns the retry policy; SDK retries would multiply it
+            "max_retries": 0,
+        }
+        self._openai = openai
+        self._client = openai.OpenAI(**options)
+        self._aclient = openai.AsyncOpenAI(**options)
+        self.models = {
+            DEFAULT_MODEL: os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            STRONG_MODEL: os.getenv("OPENAI_STRONG_MODEL", "gpt-4o"),
+        }
+
+    def translate_error(self, error: Exception) -> Exception:
+        openai = self._openai
+        if isinstance(error, openai.RateLimitError):
+            return RateLimitError(str(error), retry_after(error))
+        if isinstance(error, openai.APITimeoutError):
+            return LLMTimeoutError(str(error))
+        if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+            return ServiceUnavailableError(str(error), retry_after(error))
+        if isinstance(error, openai.APIStatusError):
+            if error.status_code >= 500:
+                return ServiceUnavailableError(str(error), retry_after(error))
+            return InvalidRequestError(str(error))
+        return _translate_connection_error(error)
+
+    @staticmethod
+    def _options(kwargs) -> dict:
+        schema = kwargs.pop("json_schema", None)
+        if schema is not None:
+            kwargs["response_format"] = {"type": "json_schema", "json_schema": {"name": "response", "schema": schema}}
+        return kwargs
+
+    @staticmethod
+    def _messages(prompt: str) -> List[dict]:
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _response(response) -> LLMResponse:
+        usage = getattr(response, "usage", None)
+        return LLMResponse(
+            response.choices[0].message.content or "",
+            getattr(usage, "total_tokens", None),
+            getattr(usage, "prompt_tokens", None),
+        )
+
+    @staticmethod
+    def _delta(chunk) -> str:
+        return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+    def generate(self, prompt, model, **kwargs):
+        with self._translated():
+            return self._response(
+                self._client.chat.completions.create(model=model, messages=self._messages(prompt), **self._options(kwargs))
+            )
+
+    def stream(self, prompt, model, **kwargs):
+        with self._translated():
+            response = self._client.chat.completions.create(
+                model=model, messages=self._messages(prompt), stream=True, **self._options(kwargs)
+            )
+            for chunk in response:
+                text = self._delta(chunk)
+                if text:
+                    yield text
+
+    async def agenerate(self, prompt, model, **kwargs):
+        with self._translated():
+            return self._response(
+                await self._aclient.chat.completions.create(model=model, messages=self._messages(prompt), **self._options(kwargs))
+            )
+
+    async def astream(self, prompt, model, **kwargs):
+        with self._translated():
+            response = await self._aclient.chat.completions.create(
+                model=model, messages=self._messages(prompt), stream=True, **self._options(kwargs)
+            )
+            async for chunk in response:
+                text = self._delta(chunk)
+                if text:
+                    yield text
+
+
+# --- local stub --------------------------------------------------------------
+
+STUB_FAILURE_KINDS = ("rate_limit", "timeout", "unavailable")
+STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "300"))
+STUB_LATENCY_SIGMA = float(os.getenv("LLM_STUB_LATENCY_SIGMA", "0.5"))
+STUB_TOKENS_PER_SECOND = float(os.getenv("LLM_STUB_TOKENS_PER_SECOND", "200"))
+STUB_OUTPUT_TOKENS = int(os.getenv("LLM_STUB_OUTPUT_TOKENS", "150"))
+STUB_FAILURE_RATE = float(os.getenv("LLM_STUB_FAILURE_RATE", "0"))
+STUB_FAILURE_KIND = os.getenv("LLM_STUB_FAILURE_KIND", "rate_limit")  # or "mixed"
+STUB_RETRY_AFTER = float(os.getenv("LLM_STUB_RETRY_AFTER", "1"))
+STUB_MAX_CONCURRENCY = int(os.getenv("LLM_STUB_MAX_CONCURRENCY", "0"))  # 0 = unlimited
+STUB_SEED = int(os.getenv("LLM_STUB_SEED", "0"))
+
+
+class StubBackend(LLMBackend):
+    """
+    Offline stand-in for load tests and benchmarks; never touches the network.
+    Each call waits a lognormal time-to-first-token (median `latency_ms`,
+    shape `latency_sigma`), then emits `output_tokens` words at
+    `tokens_per_second`. A `failure_rate` fraction of calls fails before the
+    first token with `failure_kind` ("rate_limit", "timeout", "unavailable"
+    or "mixed"); rate limits carry a `retry_after` hint. With
+    `max_concurrency` set, calls beyond it are rejected as rate limited, like
+    an overloaded server. Response text depends only on model and prompt,
+    and the latency/failure sequence only on `seed`.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency_ms: float = STUB_LATENCY_MS,
+        latency_sigma: float = STUB_LATENCY_SIGMA,
+        tokens_per_second: float = STUB_TOKENS_PER_SECOND,
+        output_tokens: int = STUB_OUTPUT_TOKENS,
+        failure_rate: float = STUB_FAILURE_RATE,
+        failure_kind: str = STUB_FAILURE_KIND,
+        retry_after: Optional[float] = STUB_RETRY_AFTER,
+        max_concurrency: int = STUB_MAX_CONCURRENCY,
+        seed: int = STUB_SEED,
+    ):
+        if failure_kind != "mixed" and failure_kind not in STUB_FAILURE_KINDS:
+            raise ValueError(f"Unknown stub failure kind: {failure_kind}")
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.failure_rate = failure_rate
+        self.failure_kind = failure_kind
+        self.retry_after = retry_after
+        self.max_concurrency = max_concurrency
+        self.models = {DEFAULT_MODEL: "stub-default", STRONG_MODEL: "stub-strong"}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def _words(self, prompt: str, model: str) -> List[str]:
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).digest()
+        return [f"w{digest[i % len(digest)] ^ (i // len(digest)):02x}" for i in range(self.output_tokens)]
+
+    def _admit(self):
+        """
+        Count the call and draw its fate: (time to first token, error or None).
+        """
+        with self._lock:
+            self.calls += 1
+            first_token = self.latency_ms / 1000 * self._rng.lognormvariate(0, self.latency_sigma)
+            error = None
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                error = RateLimitError("Stub server overloaded", self.retry_after)
+            elif self._rng.random() < self.failure_rate:
+                kind = self.failure_kind
+                if kind == "mixed":
+                    kind = self._rng.choice(STUB_FAILURE_KINDS)
+                error = {
+                    "rate_limit": lambda: RateLimitError("Stub rate limit", self.retry_after),
+                    "timeout": lambda: LLMTimeoutError("Stub timeout"),
+                    "unavailable": lambda: ServiceUnavailableError("Stub unavailable"),
+                }[kind]()
+            if error is not None:
+                self.failures += 1
+            else:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return first_token, error
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _pieces(self, prompt: str, model: str, json_schema: Optional[dict] = None, size: int = 48) -> List[str]:
+        text = self._text(prompt, model, json_schema)
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _text(self, prompt: str, model: str, json_schema: Optional[dict] = None) -> str:
+        words = self._words(prompt, model)
+        if json_schema is not None:
+            return json.dumps(_sample_schema(json_schema, iter(words * 4)))
+        return " ".join(words)
+
+    def _response(self, prompt: str, model: str, json_schema: Optional[dict] = None) -> LLMResponse:
+        text = self._text(prompt, model, json_schema)
+        prompt_tokens = len(prompt) // 4
+        return LLMResponse(text, prompt_tokens + self.output_tokens, prompt_tokens)
+
+    def generate(self, prompt, model, **kwargs):
+        first_token, error = self._admit()
+        if error is not None:
+            # Rejections come back quickly, timeouts only after the wait
+            time.sleep(first_token if isinstance(error, LLMTimeoutError) else 0)
+            raise error
+        try:
+            time.sleep(first_token + self.output_tokens / self.tokens_per_second)
+            return self._response(prompt, model, kwargs.get("json_schema"))
+        finally:
+            self._release()
+
+    def stream(self, prompt, model, **kwargs):
+        first_token, error = self._admit()
+        if error is not None:
+            time.sleep(first_token if isinstance(error, LLMTimeoutError) else 0)
+            raise error
+        try:
+            time.sleep(first_token)
+            for piece in self._pieces(prompt, model, kwargs.get("json_schema")):
+                yield piece
+                time.sleep(len(piece) / 4 / self.tokens_per_second)
+        finally:
+            self._release()
+
+    async def agenerate(self, prompt, model, **kwargs):
+        first_token, error = self._admit()
+        if error is not None:
+            await asyncio.sleep(first_token if isinstance(error, LLMTimeoutError) else 0)
+            raise error
+        try:
+            await asyncio.sleep(first_token + self.output_tokens / self.tokens_per_second)
+            return self._response(prompt, model, kwargs.get("json_schema"))
+        finally:
+            self._release()
+
+    async def astream(self, prompt, model, **kwargs):
+        first_token, error = self._admit()
+        if error is not None:
+            await asyncio.sleep(first_token if isinstance(error, LLMTimeoutError) else 0)
+            raise error
+        try:
+            await asyncio.sleep(first_token)
+            for piece in self._pieces(prompt, model, kwargs.get("json_schema")):
+                yield piece
+                await asyncio.sleep(len(piece) / 4 / self.tokens_per_second)
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+def _sample_schema(schema: dict, words: Iterator[str]):
+    """
+    Deterministic instance of a JSON Schema (objects, arrays, strings,
+    numbers, booleans) filled from `words`, for the stub's JSON mode.
+    """
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: _sample_schema(value, words) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_sample_schema(schema.get("items", {}), words) for _ in range(2)]
+    if kind == "boolean":
+        return int(next(words)[1:], 16) % 4 == 0
+    if kind in ("integer", "number"):
+        return int(next(words)[1:], 16)
+    return next(words)
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    Backend selected by `name` or the LLM_BACKEND env var (default "gemini").
+    """
+    name = (name or os.getenv("LLM_BACKEND", "gemini")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
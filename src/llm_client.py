@@ -0,0 +1,412 @@
+# llm_client.py
+import asyncio
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional, Union
+
+from dotenv import load_dotenv
+
+from src.llm_backends import (
+    DEFAULT_MODEL, STRONG_MODEL, LLMBackend, LLMError, LLMResponse, RateLimitError, TransientLLMError,
+    create_backend,
+)
+from src.prompt_budget import PromptBudget, TokenEstimator
+from src.response_cache import CACHE_ENABLED, ResponseCache, response_key
+
+# Model tiers are re-exported so callers need only this module
+__all__ = [
+    "DEFAULT_MODEL", "STRONG_MODEL", "EXPECTED_OUTPUT_TOKENS", "LLM_MAX_CONCURRENCY", "LLM_MAX_RETRIES",
+    "LLM_REQUESTS_PER_MINUTE", "LLM_TOKENS_PER_MINUTE", "CircuitBreaker", "CircuitOpenError", "LLMClient",
+    "TokenBucket", "get_llm_client", "set_llm_client",
+]
+
+# Process-wide limits shared by every LLM call in the app
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "250000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Consecutive failures that open the breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# Output tokens assumed per call when reserving token budget up front
+EXPECTED_OUTPUT_TOKENS = 1024
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(LLMError):
+    """
+    Raised without calling the API while the circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute / 60` per
+    second, holding at most `per_minute`. reserve() debits immediately (the
+    balance may go negative) and returns how long the caller must wait, so
+    concurrent callers queue up fairly instead of polling.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """
+        Correct an earlier reservation (positive refunds, negative debits).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def pause(self, seconds: float):
+        """
+        Hold everyone back for `seconds` (used when the API asks us to wait).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive outage-type failures (timeouts,
+    unavailable service; not rate limits) and rejects calls for `cooldown`
+    seconds. After that a single probe call is let through; calls arriving
+    while it is in flight are rejected with CircuitOpenError as if the
+    breaker were still open. A success closes the breaker, a failure keeps
+    it open for another cooldown.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN_SECONDS):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.cooldown - (now - self.opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"⚠️ The language model API is temporarily unavailable after repeated failures. "
+                    f"Please try again in {max(remaining, 1):.0f} seconds."
+                )
+            # This call is the probe; calls until it settles are rejected
+            self.opened_at = now
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive += 1
+            if self.consecutive >= self.failures:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        return "closed" if self.opened_at is None else "open"
+
+
+class LLMClient:
+    """
+    Shared LLM client: puts every call to the configured backend behind the
+    same request/token buckets, concurrency limit, jittered retry policy,
+    circuit breaker and response cache.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[LLMBackend] = None,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        cache: Union[ResponseCache, bool] = True,
+    ):
+        load_dotenv()
+        self.backend = backend or create_backend()
+        self.estimator = TokenEstimator()
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker()
+        self.max_retries = max_retries
+        if cache is True:
+            cache = None
+            if CACHE_ENABLED:
+                try:
+                    cache = ResponseCache()
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning("LLM response cache unavailable: %s", e)
+        self.cache = cache or None
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _cache_key(self, use_cache: bool, model: str, prompt: str, config: dict) -> Optional[str]:
+        if not use_cache or self.cache is None:
+            return None
+        return response_key(f"{self.backend.name}/{model}", prompt, config)
+
+    def _cached(self, key: Optional[str]) -> Optional[str]:
+        return self.cache.get(key) if key is not None else None
+
+    def _remember(self, key: Optional[str], model: str, text: str):
+        if key is not None and text:
+            self.cache.put(key, model, text)
+
+    def budget(self, task: str, model: str = DEFAULT_MODEL) -> PromptBudget:
+        """
+        Prompt token budget for `task` (see prompt_budget.TASK_BUDGETS) on
+        the model this client would use for `model`.
+        """
+        return PromptBudget(task, self.backend.resolve_model(model), self.estimator)
+
+    # --- admission -------------------------------------------------------
+
+    def _reservation(self, prompt: str, model: str) -> int:
+        return self.estimator.count(prompt, model) + EXPECTED_OUTPUT_TOKENS
+
+    def _admission_delay(self, prompt: str, model: str) -> float:
+        self.breaker.before_call()
+        return max(self.requests.reserve(1), self.tokens.reserve(self._reservation(prompt, model)))
+
+    @contextmanager
+    def _slot(self, prompt: str, model: str):
+        time.sleep(self._admission_delay(prompt, model))
+        with self._slots:
+            yield
+
+    @asynccontextmanager
+    async def _aslot(self, prompt: str, model: str):
+        await asyncio.sleep(self._admission_delay(prompt, model))
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def _account(self, prompt: str, model: str, response):
+        """
+        Settle the token reservation with the real usage, and calibrate the
+        estimator with the real prompt size.
+        """
+        if response.total_tokens:
+            self.tokens.adjust(self._reservation(prompt, model) - response.total_tokens)
+        self.estimator.observe(model, prompt, response.prompt_tokens)
+
+    def _account_stream(self, prompt: str, model: str, pieces: list):
+        """
+        _account() for a streamed (possibly partial) response: streams report
+        no usage, so settle with the estimated size of what was streamed.
+        """
+        text = "".join(pieces)
+        total = self.estimator.count(prompt, model) + self.estimator.count(text, model)
+        self._account(prompt, model, LLMResponse(text, total))
+
+    # --- retry policy ----------------------------------------------------
+
+    def _attempts(self, max_retries: Optional[int]) -> int:
+        # An explicit 0 means no retries, not the default; every call gets one try
+        return max(1, self.max_retries if max_retries is None else max_retries)
+
+    def _backoff(self, error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying after `error`, or None to give up.
+        """
+        if not isinstance(error, TransientLLMError):
+            # The API answered (e.g. invalid input): not a sign of an outage
+            self.breaker.record_success()
+            return None
+        if not isinstance(error, RateLimitError):
+            # Throttling means the service is up; the shared pause below
+            # handles it, so only outages count towards opening the breaker
+            self.breaker.record_failure()
+        if attempt >= max_retries - 1:
+            return None
+        # Full jitter keeps callers that failed together from retrying together
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt + 1)))
+        hint = error.retry_after
+        if hint is not None:
+            delay = max(delay, hint)
+            # The quota is shared: make every caller respect the hint
+            self.requests.pause(hint)
+        return delay
+
+    # --- calls -----------------------------------------------------------
+
+    def generate(self, prompt: str, model: str = DEFAULT_MODEL, max_retries: Optional[int] = None, cache: bool = True, **kwargs) -> str:
+        """
+        Blocking call; returns the response text. `model` is a tier
+        (DEFAULT_MODEL, STRONG_MODEL) or a backend model name. Identical
+        calls (model, prompt, config) are answered from the response cache
+        unless `cache` is off.
+        """
+        model = self.backend.resolve_model(model)
+        key = self._cache_key(cache, model, prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        max_retries = self._attempts(max_retries)
+        for attempt in range(max_retries):
+            try:
+                with self._slot(prompt, model):
+                    response = self.backend.generate(prompt, model, **kwargs)
+                self._account(prompt, model, response)
+                self.breaker.record_success()
+                self._remember(key, model, response.text)
+                return response.text
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._backoff(e, attempt, max_retries)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def stream(self, prompt: str, model: str = DEFAULT_MODEL, max_retries: Optional[int] = None, cache: bool = True, **kwargs) -> Iterator[str]:
+        """
+        Streaming call: yields text pieces. Retries only happen before the
+        first piece, so callers never see duplicated text. A cached response
+        is yielded as a single piece; a fresh one is cached once it has been
+        streamed completely.
+        """
+        model = self.backend.resolve_model(model)
+        key = self._cache_key(cache, model, prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        max_retries = self._attempts(max_retries)
+        for attempt in range(max_retries):
+            pieces = []
+            try:
+                with self._slot(prompt, model):
+                    try:
+                        for text in self.backend.stream(prompt, model, **kwargs):
+                            pieces.append(text)
+                            yield text
+                    finally:
+                        self._account_stream(prompt, model, pieces)
+                self.breaker.record_success()
+                self._remember(key, model, "".join(pieces))
+                return
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._backoff(e, attempt, max_retries)
+                if delay is None or pieces:
+                    raise
+                time.sleep(delay)
+
+    async def generate_async(self, prompt: str, model: str = DEFAULT_MODEL, max_retries: Optional[int] = None, cache: bool = True, **kwargs) -> str:
+        """
+        generate() for asyncio callers; waiting never blocks the loop.
+        """
+        model = self.backend.resolve_model(model)
+        key = self._cache_key(cache, model, prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        max_retries = self._attempts(max_retries)
+        for attempt in range(max_retries):
+            try:
+                async with self._aslot(prompt, model):
+                    response = await self.backend.agenerate(prompt, model, **kwargs)
+                self._account(prompt, model, response)
+                self.breaker.record_success()
+                self._remember(key, model, response.text)
+                return response.text
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._backoff(e, attempt, max_retries)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def astream(self, prompt: str, model: str = DEFAULT_MODEL, max_retries: Optional[int] = None, cache: bool = True, **kwargs) -> AsyncIterator[str]:
+        """
+        stream() for asyncio callers.
+        """
+        model = self.backend.resolve_model(model)
+        key = self._cache_key(cache, model, prompt, kwargs)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+        max_retries = self._attempts(max_retries)
+        for attempt in range(max_retries):
+            pieces = []
+            try:
+                async with self._aslot(prompt, model):
+                    try:
+                        async for text in self.backend.astream(prompt, model, **kwargs):
+                            pieces.append(text)
+                            yield text
+                    finally:
+                        self._account_stream(prompt, model, pieces)
+                self.breaker.record_success()
+                self._remember(key, model, "".join(pieces))
+                return
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                delay = self._backoff(e, attempt, max_retries)
+                if delay is None or pieces:
+                    raise
+                await asyncio.sleep(delay)
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Process-wide client instance, on the backend named by LLM_BACKEND.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
+
+
+def set_llm_client(client: LLMClient):
+    """
+    Replace the process-wide client (e.g. with one on a stub backend).
+    """
+    global _client
+    with _client_lock:
+        _client = client
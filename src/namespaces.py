@@ -0,0 +1,213 @@
+# namespaces.py
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+SESSIONS_DIR = os.getenv("SESSIONS_DIR", "sessions")
+# Namespaces untouched for this long are deleted by gc_idle_namespaces()
+NAMESPACE_IDLE_SECONDS = float(os.getenv("NAMESPACE_IDLE_SECONDS", str(6 * 3600)))
+GC_INTERVAL_SECONDS = 600
+
+LOCK_FILE = ".lock"
+LAST_USED_FILE = ".last_used"
+UPLOADS_DIR = "uploads"
+INDEX_LINK = "vectorstore"
+
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+_last_gc = 0.0
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    Exclusive lock on `path` (created if needed), held across processes via
+    flock. Yields False instead of waiting when `blocking` is off and the
+    lock is taken.
+    """
+    with _process_locks_guard:
+        thread_lock = _process_locks.setdefault(os.path.abspath(path), threading.Lock())
+    if not thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        thread_lock.release()
+
+
+# --- versioned index directories --------------------------------------------
+# An index "directory" is a symlink to the current vectorstore.<n> version.
+# Writers build a complete new version next to it and swap the link with one
+# os.replace, so readers only ever see a finished index.
+
+def resolve_index_dir(index_dir: str) -> Optional[str]:
+    """
+    The directory holding the current index version, or None if there is none.
+    """
+    if os.path.islink(index_dir) or os.path.isdir(index_dir):
+        resolved = os.path.realpath(index_dir)
+        return resolved if os.path.isdir(resolved) else None
+    return None
+
+
+def new_index_dir(index_dir: str) -> str:
+    """
+    Fresh, empty directory for the next version of `index_dir`.
+    """
+    path = f"{os.path.abspath(index_dir)}.{time.time_ns()}"
+    os.makedirs(path)
+    return path
+
+
+def swap_index_dir(index_dir: str, version_dir: str, keep: int = 2):
+    """
+    Atomically point `index_dir` at `version_dir`, then delete all but the
+    `keep` newest versions (readers may still be loading the previous one).
+    """
+    index_dir = os.path.abspath(index_dir)
+    if os.path.isdir(index_dir) and not os.path.islink(index_dir):
+        # Plain directory from before versioning: becomes the oldest version
+        os.replace(index_dir, f"{index_dir}.0")
+    tmp_link = f"{index_dir}.link.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(os.path.basename(version_dir), tmp_link)
+    os.replace(tmp_link, index_dir)
+
+    for old in _index_versions(index_dir)[:-keep]:
+        if old != version_dir:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _index_versions(index_dir: str) -> List[str]:
+    parent, name = os.path.split(index_dir)
+    versions = []
+    for entry in os.listdir(parent or "."):
+        suffix = entry[len(name) + 1:]
+        if entry.startswith(name + ".") and suffix.isdigit():
+            versions.append((int(suffix), os.path.join(parent, entry)))
+    return [path for _, path in sorted(versions)]
+
+
+@contextmanager
+def index_write_lock(index_dir: str):
+    """
+    Serializes writers of one index (across threads and processes).
+    """
+    parent, name = os.path.split(os.path.abspath(index_dir))
+    with file_lock(os.path.join(parent, f".{name}{LOCK_FILE}")):
+        yield
+
+
+# --- session namespaces -----------------------------------------------------
+
+class Namespace:
+    """
+    Private uploads folder and vector index for one browser session (or
+    workspace), under SESSIONS_DIR/<name>/.
+    """
+
+    def __init__(self, name: str, root_dir: str = SESSIONS_DIR):
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            raise ValueError(f"Invalid namespace name: {name!r}")
+        self.name = name
+        self.root = os.path.join(root_dir, name)
+        self.uploads_dir = os.path.join(self.root, UPLOADS_DIR)
+        self.index_dir = os.path.join(self.root, INDEX_LINK)
+        os.makedirs(self.root, exist_ok=True)
+        self.touch()
+
+    @classmethod
+    def create(cls, root_dir: str = SESSIONS_DIR) -> "Namespace":
+        return cls(uuid.uuid4().hex, root_dir)
+
+    def touch(self):
+        """
+        Mark the namespace as in use (postpones garbage collection).
+        """
+        with open(os.path.join(self.root, LAST_USED_FILE), "w", encoding="utf-8") as f:
+            f.write(str(time.time()))
+
+    def has_index(self) -> bool:
+        return resolve_index_dir(self.index_dir) is not None
+
+    def reset_uploads(self):
+        """
+        Empty the uploads folder, ready for a new set of papers.
+        """
+        shutil.rmtree(self.uploads_dir, ignore_errors=True)
+        os.makedirs(self.uploads_dir, exist_ok=True)
+
+    def clear(self):
+        """
+        Drop uploads and every index version, keeping the namespace itself.
+        """
+        with index_write_lock(self.index_dir):
+            self.reset_uploads()
+            if os.path.lexists(self.index_dir) and os.path.islink(self.index_dir):
+                os.remove(self.index_dir)
+            for version in _index_versions(self.index_dir):
+                shutil.rmtree(version, ignore_errors=True)
+
+
+def idle_seconds(root: str) -> float:
+    try:
+        return time.time() - os.path.getmtime(os.path.join(root, LAST_USED_FILE))
+    except OSError:
+        return float("inf")
+
+
+def gc_idle_namespaces(root_dir: str = SESSIONS_DIR, max_idle: float = NAMESPACE_IDLE_SECONDS, force: bool = False) -> List[str]:
+    """
+    Delete namespaces idle for more than `max_idle` seconds. Namespaces with
+    an index update in progress are skipped. Runs at most once per
+    GC_INTERVAL_SECONDS per process unless `force` is set. Returns the
+    names removed.
+    """
+    global _last_gc
+    now = time.time()
+    if not force and now - _last_gc < GC_INTERVAL_SECONDS:
+        return []
+    _last_gc = now
+    if not os.path.isdir(root_dir):
+        return []
+
+    removed = []
+    for name in os.listdir(root_dir):
+        root = os.path.join(root_dir, name)
+        if name.startswith(".") or not os.path.isdir(root) or idle_seconds(root) <= max_idle:
+            continue
+        # Same lock file as index_write_lock(), but never wait for it
+        with file_lock(os.path.join(root, f".{INDEX_LINK}{LOCK_FILE}"), blocking=False) as locked:
+            if not locked or idle_seconds(root) <= max_idle:
+                continue
+            # Rename first so nobody sees a half-deleted namespace
+            trash = os.path.join(root_dir, f".trash-{name}-{uuid.uuid4().hex[:8]}")
+            os.replace(root, trash)
+        shutil.rmtree(trash, ignore_errors=True)
+        removed.append(name)
+    return removed
@@ -1,31 +1,398 @@
 # pdf_loader.py
+import bisect
 import fitz
+import multiprocessing
+import os
 import re
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from src.chunker import CHUNK_OVERLAP, CHUNK_SIZE, annotate_spans, chunk_spans
+from src.document_store import get_document_store, hash_pdf
+from src.section_index import CORE_SECTIONS, SECTION_HEADING, SectionSegmenter, canonical_section
+
+# Upper bound on worker processes used for batch extraction
+MAX_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+
+NO_METHODS_FOUND = "No distinct methods section found."
+
+# Bumped whenever the stored record layout changes; older entries are re-parsed
+RECORD_VERSION = 2
+
+# Rough characters-per-token ratio used to turn token budgets into page reads
+CHARS_PER_TOKEN = 4
+
+# How many pages from the start (or end, for tail regions) to search for a region
+REGION_SCAN_PAGES = 5
+TAIL_REGIONS = {"conclusion", "discussion", "references"}
+
+def _read_pdf_bytes(pdf_path_or_bytes):
+    if isinstance(pdf_path_or_bytes, bytes):
+        return pdf_path_or_bytes
+    with open(pdf_path_or_bytes, "rb") as f:
+        return f.read()
+
+def _iter_fitz_pages(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            yield page.number + 1, page.get_text("text")
+
+def _parse_pdf(pdf_bytes):
+    """
+    Runs PyMuPDF once and returns the record kept in the document store:
+    full text, the character offset where each page starts, and the
+    section table built from the same layout pass.
+    """
+    segmenter = SectionSegmenter()
+    pages = []
+    page_offsets = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            page_offsets.append(segmenter.offset)
+            pages.append(segmenter.add_page(page))
+
+    return {
+        "version": RECORD_VERSION,
+        "text": "".join(pages),
+        "page_offsets": page_offsets,
+        "sections": segmenter.table(),
+    }
+
+def _cached_record(doc_hash):
+    record = get_document_store().get(doc_hash)
+    if record is None or record.get("version") != RECORD_VERSION:
+        return None
+    return record
+
+def _parse_pdf_safe(pdf_bytes):
+    """
+    Worker entry point: returns (record, error) so one bad file never raises.
+    """
+    try:
+        return _parse_pdf(pdf_bytes), None
+    except Exception as e:
+        return None, str(e)
+
+def load_document(pdf_path_or_bytes):
+    """
+    Returns the parsed record for a PDF (path or bytes), parsing it only
+    if its content hash is not already in the document store.
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_path_or_bytes)
+    doc_hash = hash_pdf(pdf_bytes)
+    record = _cached_record(doc_hash)
+    if record is None:
+        record = _parse_pdf(pdf_bytes)
+        get_document_store().put(doc_hash, record)
+    record["sha256"] = doc_hash
+    return record
 
 def extract_text_from_pdf(pdf_path_or_bytes):
     """
     Works with file path or uploaded file bytes.
     """
-    text = ""
-    if isinstance(pdf_path_or_bytes, bytes):
-        with fitz.open(stream=pdf_path_or_bytes, filetype="pdf") as doc:
-            for page in doc:
-                text += page.get_text("text")
+    return load_document(pdf_path_or_bytes)["text"]
+
+def extract_texts_from_pdfs(pdfs, max_workers=None):
+    """
+    Extracts text from many PDFs (paths or raw bytes) in a bounded process pool.
+    Returns a list of (text, error) tuples in the same order as `pdfs`;
+    `error` is None on success, otherwise the failure message for that file.
+    Papers already in the document store are served without re-parsing.
+    """
+    store = get_document_store()
+    results = []
+    misses = []  # (result index, hash, bytes) for papers not yet parsed
+
+    for pdf in pdfs:
+        try:
+            pdf_bytes = _read_pdf_bytes(pdf)
+        except OSError as e:
+            results.append(("", str(e)))
+            continue
+        doc_hash = hash_pdf(pdf_bytes)
+        record = _cached_record(doc_hash)
+        if record is not None:
+            results.append((record["text"], None))
+        else:
+            results.append(None)
+            misses.append((len(results) - 1, doc_hash, pdf_bytes))
+
+    if not misses:
+        return results
+
+    workers = min(len(misses), max_workers or MAX_EXTRACT_WORKERS)
+    miss_bytes = [pdf_bytes for _, _, pdf_bytes in misses]
+    if workers <= 1:
+        parsed = [_parse_pdf_safe(pdf_bytes) for pdf_bytes in miss_bytes]
     else:
-        with fitz.open(pdf_path_or_bytes) as doc:
-            for page in doc:
-                text += page.get_text("text")
-    return text
+        # Spawned, not forked: the app process already runs threads (warm-up,
+        # asyncio runtime, torch/FAISS pools) whose locks a fork would copy held
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # map() preserves input order regardless of completion order
+            parsed = list(pool.map(_parse_pdf_safe, miss_bytes))
+
+    for (idx, doc_hash, _), (record, error) in zip(misses, parsed):
+        if error:
+            results[idx] = ("", error)
+        else:
+            store.put(doc_hash, record)
+            results[idx] = (record["text"], None)
+    return results
+
+def iter_pdf_pages(pdf_path_or_bytes):
+    """
+    Yields (page_number, text) one page at a time, page numbers starting at 1.
+    Cached papers are sliced out of the document store; others are streamed
+    from PyMuPDF without ever holding the whole document text.
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_path_or_bytes)
+    record = _cached_record(hash_pdf(pdf_bytes))
+    if record is None:
+        yield from _iter_fitz_pages(pdf_bytes)
+        return
+
+    text = record["text"]
+    bounds = record["page_offsets"] + [len(text)]
+    for i in range(len(record["page_offsets"])):
+        yield i + 1, text[bounds[i]:bounds[i + 1]]
+
+@contextmanager
+def _open_pages(pdf_path_or_bytes):
+    """
+    Yields (page_count, get_page_text, record) where pages are only read on
+    demand: sliced from the document store on a hit, opened lazily in PyMuPDF
+    otherwise (record is then None).
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_path_or_bytes)
+    record = _cached_record(hash_pdf(pdf_bytes))
+    if record is not None:
+        text = record["text"]
+        bounds = record["page_offsets"] + [len(text)]
+        yield len(record["page_offsets"]), lambda i: text[bounds[i]:bounds[i + 1]], record
+        return
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        yield doc.page_count, lambda i: doc.load_page(i).get_text("text"), None
+
+def _find_heading(page_text, region=None):
+    """
+    Returns (canonical_name, start, end) of the first heading line on the page
+    (restricted to `region` when given), or None.
+    """
+    for match in SECTION_HEADING.finditer(page_text):
+        name = canonical_section(match.group(1))
+        if region is None or name == region:
+            return name, match.start(), match.end()
+    return None
+
+def _extract_region(page_count, get_page, region, max_chars):
+    """
+    Collects the text of one section, reading as few pages as possible.
+    Head regions are searched from the first page, tail regions (e.g.
+    conclusion) from the last page backwards.
+    """
+    if region in TAIL_REGIONS:
+        candidates = range(page_count - 1, max(page_count - REGION_SCAN_PAGES, 0) - 1, -1)
+    else:
+        candidates = range(min(REGION_SCAN_PAGES, page_count))
+
+    for i in candidates:
+        page_text = get_page(i)
+        heading = _find_heading(page_text, region)
+        if heading is None:
+            continue
+
+        parts = []
+        collected = 0
+        body = page_text[heading[2]:]
+        page_index = i
+        while True:
+            end = _find_heading(body)
+            if end is not None:
+                body = body[:end[1]]
+            parts.append(body)
+            collected += len(body)
+            page_index += 1
+            if end is not None or collected >= max_chars or page_index >= page_count:
+                break
+            body = get_page(page_index)
+        return "".join(parts).strip()[:max_chars]
+    return ""
+
+def extract_text_budgeted(pdf_path_or_bytes, max_chars=None, max_tokens=None, regions=None):
+    """
+    Extracts only as much text as a prompt can use, stopping page reads
+    once the character (or estimated token) budget is met.
+    With `regions` (e.g. ["abstract", "introduction", "conclusion"]) the
+    budget is split across those sections; if none are found, the leading
+    text of the paper is returned instead.
+    """
+    budget = max_chars
+    if max_tokens is not None:
+        token_chars = max_tokens * CHARS_PER_TOKEN
+        budget = token_chars if budget is None else min(budget, token_chars)
+
+    with _open_pages(pdf_path_or_bytes) as (page_count, get_page, record):
+        if budget is None:
+            return "".join(get_page(i) for i in range(page_count))
+
+        if regions:
+            per_region = budget // len(regions)
+            parts = []
+            for region in regions:
+                if record is not None:
+                    # Parsed papers carry a section table: exact O(1) slices
+                    region_text = _section_text(record, region)[:per_region]
+                else:
+                    region_text = _extract_region(page_count, get_page, canonical_section(region), per_region)
+                if region_text:
+                    parts.append(f"{region.title()}:\n{region_text}")
+            if parts:
+                return "\n\n".join(parts)[:budget]
+
+        parts = []
+        collected = 0
+        for i in range(page_count):
+            page_text = get_page(i)
+            parts.append(page_text)
+            collected += len(page_text)
+            if collected >= budget:
+                break
+        return "".join(parts)[:budget]
 
 def chunk_text(text):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
-    return splitter.split_text(text)
+    return [text[start:end] for start, end in chunk_spans(text)]
 
-def extract_methods_section(text):
+def chunk_pages(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, window_chars=8000):
     """
-    Extracts the 'Methodology' or 'Methods' section using regex.
+    Incrementally chunks a stream of (page_number, text) pairs.
+    Yields (chunk, metadata) where metadata holds the chunk's page range.
+    Only a sliding window of roughly `window_chars` characters is buffered,
+    and the chunks are identical to chunking the whole text at once.
+    """
+    buffer = ""
+    page_starts = []  # buffer offset where each buffered page begins
+    page_numbers = []
+
+    def page_at(offset):
+        return page_numbers[bisect.bisect_right(page_starts, offset) - 1]
+
+    def split_buffer(final):
+        nonlocal buffer, page_starts, page_numbers
+        cut = len(buffer)
+        for start, end in chunk_spans(buffer, chunk_size, chunk_overlap):
+            # A chunk whose size window runs past the buffer may still grow
+            # once more text arrives, so it is re-split with the next window.
+            if not final and start + chunk_size >= len(buffer):
+                cut = start
+                break
+            yield buffer[start:end], {"page_start": page_at(start), "page_end": page_at(max(start, end - 1))}
+
+        # Keep the undecided tail and the pages it spans
+        first = max(bisect.bisect_right(page_starts, cut) - 1, 0)
+        page_numbers = page_numbers[first:]
+        page_starts = [0] + [start - cut for start in page_starts[first + 1:]]
+        buffer = buffer[cut:]
+
+    for page_number, page_text in pages:
+        if not page_text:
+            continue
+        if not buffer:
+            page_starts, page_numbers = [], []
+        page_starts.append(len(buffer))
+        page_numbers.append(page_number)
+        buffer += page_text
+        if len(buffer) >= window_chars:
+            yield from split_buffer(final=False)
+
+    if buffer.strip():
+        yield from split_buffer(final=True)
+
+def document_chunk_spans(pdf_path_or_bytes):
     """
+    Chunks a parsed PDF as offsets only: returns (text, spans) where each
+    span is (start, end, metadata) with page range and section name.
+    Strings are materialized by the caller, e.g. right before embedding.
+    """
+    record = load_document(pdf_path_or_bytes)
+    spans = chunk_spans(record["text"])
+    return record["text"], annotate_spans(spans, record["page_offsets"], record["sections"])
+
+def iter_document_chunks(pdf_path_or_bytes):
+    """
+    Streams (chunk, metadata) pairs for a PDF with page provenance.
+    Papers already in the document store are chunked by offset over the
+    stored text (adding section names); others are streamed page by page.
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_path_or_bytes)
+    if _cached_record(hash_pdf(pdf_bytes)) is None:
+        yield from chunk_pages(iter_pdf_pages(pdf_bytes))
+        return
+
+    text, spans = document_chunk_spans(pdf_bytes)
+    for start, end, metadata in spans:
+        yield text[start:end], metadata
+
+def _section_text(record, name):
+    span = record["sections"].get(canonical_section(name))
+    return record["text"][span[0]:span[1]].strip() if span else ""
+
+def get_section(pdf_path_or_bytes, name):
+    """
+    Returns one section (e.g. "methods", "conclusion") of a PDF by slicing
+    the stored section table, or "" when the paper has no such heading.
+    """
+    return _section_text(load_document(pdf_path_or_bytes), name)
+
+def segment_sections(pdf_path_or_bytes, needed=CORE_SECTIONS):
+    """
+    Returns {name: text} for the `needed` sections found in a PDF.
+    Unparsed papers are scanned page by page and the scan stops as soon as
+    every needed section has been closed by the following heading.
+    """
+    pdf_bytes = _read_pdf_bytes(pdf_path_or_bytes)
+    record = _cached_record(hash_pdf(pdf_bytes))
+    if record is None:
+        segmenter = SectionSegmenter(needed)
+        pages = []
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            for page in doc:
+                pages.append(segmenter.add_page(page))
+                if segmenter.done:
+                    break
+        record = {"text": "".join(pages), "sections": segmenter.table()}
+
+    sections = {}
+    for name in needed:
+        section = _section_text(record, name)
+        if section:
+            sections[canonical_section(name)] = section
+    return sections
+
+def extract_sections(pdf_path_or_bytes, regions, max_tokens):
+    """
+    [(section, text)] for the `regions` a PDF has, in the order given (most
+    relevant first), for a prompt budget to pack. Papers without any of
+    them fall back to their leading text, read up to `max_tokens`.
+    """
+    found = segment_sections(pdf_path_or_bytes, needed=regions)
+    sections = [(region, found[canonical_section(region)]) for region in regions if canonical_section(region) in found]
+    if sections:
+        return sections
+    return [("text", extract_text_budgeted(pdf_path_or_bytes, max_tokens=max_tokens))]
+
+def _find_methods_section(text):
     pattern = r"(?:Methodology|Methods|Materials and Methods)([\s\S]*?)(?:Results|Experiments|Discussion|Conclusion|References|Bibliography)"
     match = re.search(pattern, text, re.IGNORECASE)
-    return match.group(1).strip() if match else "No distinct methods section found."
+    return match.group(1).strip() if match else NO_METHODS_FOUND
+
+def extract_methods_section(text_or_pdf_bytes):
+    """
+    Extracts the 'Methodology' or 'Methods' section using regex.
+    Given raw PDF bytes, the layout-based section table is used instead and
+    the regex is only a fallback for papers without detectable headings.
+    """
+    if isinstance(text_or_pdf_bytes, bytes):
+        record = load_document(text_or_pdf_bytes)
+        return _section_text(record, "methods") or _find_methods_section(record["text"])
+    return _find_methods_section(text_or_pdf_bytes)
@@ -0,0 +1,209 @@
+# prompt_budget.py
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Context windows of the models we know; anything else (local servers, the
+# stub) gets the conservative default
+MODEL_CONTEXT_TOKENS = {
+    "gemini-2.5-flash": 1_048_576,
+    "gemini-2.5-pro": 1_048_576,
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+}
+DEFAULT_CONTEXT_TOKENS = 32_768
+# Kept free for the answer (2.5 models also spend output tokens on thinking)
+OUTPUT_RESERVE_TOKENS = 8192
+
+# Input budgets per task, in tokens. With million-token windows the window is
+# rarely the limit: these keep prompts to the content that pays for itself.
+# Override one with PROMPT_BUDGET_<TASK>, e.g. PROMPT_BUDGET_REVIEW=8000.
+TASK_BUDGETS = {
+    "qa": 4000,
+    "suggest": 800,
+    "review": 5000,
+    "extract": 4000,
+    "methods": 6000,
+    "compare": 10000,
+}
+
+# Sections, most useful first, that each task reads from a paper
+TASK_SECTIONS = {
+    "suggest": ("abstract", "introduction"),
+    "review": ("abstract", "conclusion", "introduction"),
+    "extract": ("experiments", "results", "methods", "abstract"),
+}
+
+# A section cut shorter than this is dropped rather than sent as a fragment
+MIN_SECTION_TOKENS = 40
+
+# Sub-word pieces: words, numbers and single punctuation marks
+_PIECE = re.compile(r"\w+|[^\w\s]")
+# Characters per sub-word token within one word (BPE/SentencePiece on English)
+WORD_CHARS_PER_TOKEN = 4
+CALIBRATION_WEIGHT = 0.1
+
+
+class TokenEstimator:
+    """
+    Counts tokens without the provider's tokenizer. Every word costs one
+    token per WORD_CHARS_PER_TOKEN characters and every punctuation mark one
+    token, which tracks real tokenizers far better than a flat
+    characters-per-token ratio on tables, numbers and LaTeX. Each model's
+    estimate is then scaled by a factor calibrated from the prompt token
+    counts the API reports (see observe()).
+    """
+
+    def __init__(self):
+        self._factors: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _raw(text: str) -> int:
+        return sum(1 + (len(piece) - 1) // WORD_CHARS_PER_TOKEN for piece in _PIECE.findall(text))
+
+    def factor(self, model: Optional[str] = None) -> float:
+        return self._factors.get(model, 1.0)
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        return int(self._raw(text) * self.factor(model) + 0.5)
+
+    def observe(self, model: str, prompt: str, prompt_tokens: Optional[int]):
+        """
+        Fold one actual prompt token count into the model's factor
+        (exponential moving average, so a few odd prompts do not swing it).
+        """
+        raw = self._raw(prompt)
+        if not prompt_tokens or raw < 50:
+            return
+        ratio = min(max(prompt_tokens / raw, 0.5), 2.0)
+        with self._lock:
+            current = self._factors.get(model)
+            self._factors[model] = ratio if current is None else current + CALIBRATION_WEIGHT * (ratio - current)
+
+    def truncate(self, text: str, max_tokens: int, model: Optional[str] = None) -> str:
+        """
+        Longest prefix of `text` within `max_tokens`, cut at a sentence or
+        line end when one is close to the limit.
+        """
+        if max_tokens <= 0:
+            return ""
+        limit = max_tokens / self.factor(model)
+        used = 0
+        end = 0
+        for match in _PIECE.finditer(text):
+            used += 1 + (match.end() - match.start() - 1) // WORD_CHARS_PER_TOKEN
+            if used > limit:
+                break
+            end = match.end()
+        else:
+            return text
+        cut = text[:end]
+        boundary = max(cut.rfind("\n"), cut.rfind(". "))
+        if boundary > len(cut) * 0.8:
+            cut = cut[:boundary + 1]
+        return cut.rstrip()
+
+
+def allocate(demands: Sequence[int], total: int) -> List[int]:
+    """
+    Split `total` across `demands` fairly (water-filling): nobody gets more
+    than they need, and what small demands leave over is shared equally by
+    the larger ones.
+    """
+    shares = [0] * len(demands)
+    pending = sorted(range(len(demands)), key=lambda i: demands[i])
+    remaining = total
+    while pending:
+        fair = remaining // len(pending)
+        i = pending[0]
+        if demands[i] <= fair:
+            shares[i] = demands[i]
+            remaining -= demands[i]
+            pending.pop(0)
+        else:
+            for i in pending:
+                shares[i] = fair
+            break
+    return shares
+
+
+class PromptBudget:
+    """
+    Token budget for one prompt: the task's budget, capped by what the
+    model's context window leaves after OUTPUT_RESERVE_TOKENS. Content is
+    fitted into whatever the prompt template does not use.
+    """
+
+    def __init__(self, task: str, model: str, estimator: Optional[TokenEstimator] = None):
+        self.task = task
+        self.model = model
+        self.estimator = estimator or TokenEstimator()
+        window = MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS) - OUTPUT_RESERVE_TOKENS
+        self.tokens = min(int(os.getenv(f"PROMPT_BUDGET_{task.upper()}", TASK_BUDGETS[task])), window)
+
+    def count(self, text: str) -> int:
+        return self.estimator.count(text, self.model)
+
+    def available(self, template: str = "") -> int:
+        return max(self.tokens - self.count(template), 0)
+
+    def fit(self, text: str, template: str = "") -> str:
+        """
+        `text` cut to fit the budget next to `template`.
+        """
+        return self.estimator.truncate(text, self.available(template), self.model)
+
+    def fit_many(self, texts: Sequence[str], template: str = "") -> List[str]:
+        """
+        Several texts sharing one budget (e.g. two papers in one prompt).
+        """
+        shares = allocate([self.count(text) for text in texts], self.available(template))
+        return [self.estimator.truncate(text, share, self.model) for text, share in zip(texts, shares)]
+
+    def pack(self, papers: Sequence[Tuple[str, Sequence[Tuple[str, str]]]], template: str = "") -> str:
+        """
+        Lay out several papers' sections in the budget. `papers` holds
+        (name, [(section, text), ...]) with sections most relevant first.
+        Papers share the budget fairly; within a paper, sections are added
+        in order and the first one that does not fit is cut to what is left.
+        """
+        blocks = []
+        for name, sections in papers:
+            header = f"=== {name} ===\n" if name else ""
+            parts = [
+                (f"{section.title()}:\n" if section else "", text.strip())
+                for section, text in sections if text.strip()
+            ]
+            blocks.append((header, parts))
+
+        demands = [
+            self.count(header) + sum(self.count(label) + self.count(text) + 1 for label, text in parts)
+            for header, parts in blocks
+        ]
+        shares = allocate(demands, self.available(template))
+
+        packed = []
+        for (header, parts), share in zip(blocks, shares):
+            left = share - self.count(header)
+            kept = []
+            for label, text in parts:
+                room = left - self.count(label) - 1
+                if self.count(text) <= room:
+                    fitted = text
+                elif room >= MIN_SECTION_TOKENS:
+                    fitted = self.estimator.truncate(text, room, self.model)
+                else:
+                    break
+                kept.append(label + fitted)
+                left -= self.count(label) + self.count(fitted) + 1
+            if kept:
+                packed.append(header + "\n\n".join(kept))
+        return "\n\n".join(packed)
+
+    def fill(self, content: Union[str, Sequence], template: str = "") -> str:
+        """
+        fit() for a plain string, pack() for a list of papers.
+        """
+        return self.fit(content, template) if isinstance(content, str) else self.pack(content, template)
@@ -1,19 +1,8 @@
 # question_suggester.py
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
+from src.llm_client import STRONG_MODEL, get_llm_client
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-def generate_smart_questions(paper_text: str, n: int = 5):
-    """
-    Use Gemini 2.5 Pro to generate intelligent research questions.
-    """
-    if not paper_text or len(paper_text.strip()) < 100:
-        return []
-
-    prompt = f"""
+def _suggest_prompt(paper_text: str, n: int) -> str:
+    return f"""
 You are an expert research assistant.
 Read the following text from a research paper and generate {n} insightful, diverse questions 
 that a researcher might ask to better understand the paper.
@@ -21,15 +10,26 @@ that a researcher might ask to better understand the paper.
 Focus on methods, results, datasets, evaluation, and innovation aspects.
 
 Text:
-{paper_text[:2000]}
+{paper_text}
 
 Return only a numbered list of questions.
 """
 
+def generate_smart_questions(paper_text, n: int = 5):
+    """
+    Use Gemini 2.5 Pro to generate intelligent research questions.
+    `paper_text` is a string or a list of (paper name, [(section, text)])
+    to pack into the "suggest" token budget.
+    """
+    client = get_llm_client()
+    paper_text = client.budget("suggest", STRONG_MODEL).fill(paper_text, _suggest_prompt("", n))
+    if not paper_text or len(paper_text.strip()) < 100:
+        return []
+
+    prompt = _suggest_prompt(paper_text, n)
+
     try:
-        model = genai.GenerativeModel("gemini-2.5-pro")
-        response = model.generate_content(prompt)
-        text = response.text
+        text = client.generate(prompt, model=STRONG_MODEL)
         questions = [q.strip("•- \n") for q in text.split("\n") if "?" in q]
         return questions[:n]
     except Exception as e:
@@ -1,53 +1,375 @@
 # rag_pipeline.py
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from src.gemini_wrapper import call_gemini 
+from src.async_runtime import get_loop, iterate_sync, submit
+from src.gemini_wrapper import call_gemini, call_gemini_astream, call_gemini_async, call_gemini_stream
+from src.llm_client import get_llm_client
+from src.answer_cache import SemanticAnswerCache
+from src.embedding_cache import get_embedding_cache
+from src.ingest import INGEST_BATCH_SIZE, INGEST_WORKERS, ingest_documents
+from src.query_cache import LRUCache, normalize_query
+from src.namespaces import (
+    INDEX_LINK,
+    SESSIONS_DIR,
+    gc_idle_namespaces,
+    index_write_lock,
+    new_index_dir,
+    resolve_index_dir,
+    swap_index_dir,
+)
+from src.registry import get_embedder, get_vector_index, invalidate, publish_vector_index, warm_up
+from src.vector_index import VectorIndex
+import asyncio
 import os
+import shutil
+from collections import OrderedDict
 
-def create_or_load_vectorstore(pdf_dir="data"):
-    from src.pdf_loader import extract_text_from_pdf, chunk_text
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-    from langchain_community.vectorstores import FAISS
-    import shutil, os
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+VECTORSTORE_DIR = "vectorstore"
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+# Prefetched retrievals kept per QA session; the oldest unasked one goes first
+QA_PREFETCH_LIMIT = int(os.getenv("QA_PREFETCH_LIMIT", "16"))
 
-    embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Normalized query -> embedding; independent of the index, so never invalidated
+_query_embeddings = LRUCache(QUERY_CACHE_SIZE)
+# (index dir, (version dir, version), normalized query, k, filters) -> retrieved Documents
+_retrievals = LRUCache(RETRIEVAL_CACHE_SIZE)
+_live_versions = {}  # index dir -> index version the retrieval cache was filled from
+# Answers to earlier (paraphrased) questions over the same papers and chunks
+_answers = SemanticAnswerCache()
 
-    # ✅ Step 1: clear old vectorstore before creating new
-    if os.path.exists("vectorstore"):
-        shutil.rmtree("vectorstore")  # deletes old FAISS index
+def create_or_load_vectorstore(
+    pdf_dir="data", workers=INGEST_WORKERS, batch_size=INGEST_BATCH_SIZE, index_dir=VECTORSTORE_DIR
+):
+    """
+    Brings the vector store at `index_dir` in line with the PDFs in `pdf_dir`.
+    Documents are tracked by content hash, so only added, removed or
+    replaced papers are (re-)embedded; unchanged ones are left untouched.
+    New papers go through the batched ingest pipeline (`workers` encoder
+    processes); its throughput is left on `db.ingest_stats`.
+    Each update is written as a new index version and swapped in
+    atomically, under a lock that serializes writers of `index_dir`.
+    """
+    from src.pdf_loader import iter_document_chunks
+    from src.document_store import hash_pdf
 
-    all_texts = []
-    metadatas = []
+    embedder = get_embedder(EMBEDDING_MODEL)
+    cache = get_embedding_cache(EMBEDDING_MODEL)
+    with index_write_lock(index_dir):
+        # Update a private copy; queries keep using the published one meanwhile
+        live_dir = resolve_index_dir(index_dir)
+        db = VectorIndex.load(live_dir, embedder, EMBEDDING_MODEL, cache) if live_dir else None
+        if db is None:
+            db = VectorIndex(index_dir, embedder, EMBEDDING_MODEL, cache)
+        changed = False
 
-    for pdf in os.listdir(pdf_dir):
-        if pdf.endswith(".pdf"):
-            path = os.path.join(pdf_dir, pdf)
-            text = extract_text_from_pdf(path)
-            chunks = chunk_text(text)
-            all_texts.extend(chunks)
-            metadatas.extend([{"source": pdf}] * len(chunks))
+        # ✅ Step 1: hash the current uploads
+        current = {}
+        for pdf in sorted(os.listdir(pdf_dir)):
+            if pdf.endswith(".pdf"):
+                with open(os.path.join(pdf_dir, pdf), "rb") as f:
+                    current[hash_pdf(f.read())] = pdf
 
-    # ✅ Step 2: build new FAISS store only for uploaded PDFs
-    db = FAISS.from_texts(all_texts, embedder, metadatas=metadatas)
-    db.save_local("vectorstore")
+        # ✅ Step 2: drop papers that are gone (or replaced by new content)
+        for doc_hash in list(db.documents):
+            if doc_hash not in current:
+                db.remove_document(doc_hash)
+                changed = True
+
+        # ✅ Step 3: embed only new papers; renamed ones just get new metadata
+        new_docs = []
+        for doc_hash, pdf in current.items():
+            if not db.has_document(doc_hash):
+                new_docs.append((doc_hash, pdf, iter_document_chunks(os.path.join(pdf_dir, pdf))))
+            elif db.documents[doc_hash]["source"] != pdf:
+                db.rename_document(doc_hash, pdf)
+                changed = True
+
+        db.ingest_stats = ingest_documents(db, new_docs, EMBEDDING_MODEL, workers=workers, batch_size=batch_size)
+        failed = set(db.ingest_stats["failed"])
+        for doc_hash, pdf, _ in new_docs:
+            # Papers without extractable text are still recorded, so they are not
+            # retried; ones that failed to parse are retried on the next build
+            if doc_hash not in failed:
+                db.documents.setdefault(doc_hash, {"source": pdf, "ids": []})
+                changed = True
+
+        if not len(db):
+            raise ValueError("No text could be extracted from the uploaded PDFs.")
+        # ✅ Step 4: pick the ANN backend that fits the corpus size
+        changed = db.rebuild_if_needed() or changed
+        if not changed and live_dir:
+            return db
+
+        # ✅ Step 5: write a complete new version, then swap it in
+        db.path = new_index_dir(index_dir)
+        try:
+            db.save()
+            swap_index_dir(index_dir, db.path)
+        except Exception:
+            shutil.rmtree(db.path, ignore_errors=True)
+            raise
+        publish_vector_index(index_dir, db)
 
     return db
 
 
-def load_vectorstore():
-    embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    return FAISS.load_local("vectorstore", embedder, allow_dangerous_deserialization=True)
+def collect_idle_sessions(root_dir=SESSIONS_DIR):
+    """
+    Delete idle session namespaces and forget their in-memory indexes.
+    """
+    removed = gc_idle_namespaces(root_dir)
+    for name in removed:
+        index_dir = os.path.join(root_dir, name, INDEX_LINK)
+        invalidate(index_dir)
+        _live_versions.pop(index_dir, None)
+        _retrievals.discard_if(lambda key: key[0] == index_dir)
+    return removed
+
+
+def embedding_cache_stats():
+    """
+    Hit/miss counters of the chunk embedding cache for the active model.
+    """
+    return get_embedding_cache(EMBEDDING_MODEL).stats()
+
+
+def warm_up_embedder():
+    """
+    Begin loading the embedding model in the background (call at app startup).
+    """
+    warm_up(EMBEDDING_MODEL)
+
+
+def load_vectorstore(index_dir=VECTORSTORE_DIR):
+    # Served from memory unless the index on disk has a newer version
+    return get_vector_index(index_dir, EMBEDDING_MODEL)
 
-def get_qa_chain():
-    db = load_vectorstore()
-    retriever = db.as_retriever(search_kwargs={"k": 4})
+
+def embed_query(question: str):
+    """
+    Query embedding, computed once per distinct (normalized) question.
+    """
+    normalized = normalize_query(question)
+    return _query_embeddings.get_or_compute(
+        (EMBEDDING_MODEL, normalized), lambda: get_embedder(EMBEDDING_MODEL).embed_query(normalized)
+    )
+
+
+def retrieve(db, question: str, k: int = 4, filters=None, index_dir=VECTORSTORE_DIR):
+    """
+    Top `k` chunks for `question` from `db`, the index served for
+    `index_dir`. Repeat questions against the same index version skip both
+    the encoder and the search; results for older index versions are
+    dropped as soon as a newer one is seen.
+    """
+    version = (db.path, db.version)
+    if _live_versions.get(index_dir) != version:
+        _live_versions[index_dir] = version
+        _retrievals.discard_if(lambda key: key[0] == index_dir and key[1] != version)
+
+    normalized = normalize_query(question)
+    key = (index_dir, version, normalized, k, tuple(sorted((filters or {}).items())))
+    docs = _retrievals.get(key)
+    if docs is None:
+        docs = db.similarity_search(normalized, k=k, filters=filters, query_vector=embed_query(question))
+        _retrievals.put(key, docs)
+    return docs
+
+
+def retrieval_cache_stats():
+    """
+    Hit/miss counters of the query-embedding and retrieval caches.
+    """
+    return {
+        "query_embeddings": _query_embeddings.stats(),
+        "retrievals": _retrievals.stats(),
+        "answers": _answers.stats(),
+    }
+
+def _prepare_answer(db, question: str, index_dir=VECTORSTORE_DIR):
+    """
+    Retrieval half of answering: (answer-cache scope, query vector, context).
+    """
+    # Retrieve top chunks
+    docs = retrieve(db, question, k=4, index_dir=index_dir)
+    # A paraphrase of an earlier question over the same context reuses its answer
+    scope = (tuple(sorted(db.documents)), tuple(sorted(d.metadata["chunk_id"] for d in docs)))
+    query_vector = embed_query(question)
+    # Chunks share the "qa" token budget (a no-op unless chunks are unusually long)
+    texts = get_llm_client().budget("qa").fit_many([d.page_content for d in docs])
+    context = "\n\n".join([f"[{d.metadata['source']}]\n{text}" for d, text in zip(docs, texts)])
+    return scope, query_vector, context
+
+
+def get_qa_chain(index_dir=VECTORSTORE_DIR, stream=False):
+    """
+    Question -> answer function over the index at `index_dir`. With
+    `stream`, it returns a generator of answer text pieces instead (for
+    st.write_stream); the answer is cached once the stream completes.
+    """
+    db = load_vectorstore(index_dir)
+    if db is None:
+        raise Exception("⚠️ No indexed papers found. Please upload and index PDFs first!")
 
     def qa_function(question: str):
-        # Retrieve top chunks
-        docs = retriever.invoke(question)
-        context = "\n\n".join([f"[{d.metadata['source']}]\n{d.page_content}" for d in docs])
+        scope, query_vector, context = _prepare_answer(db, question, index_dir)
+        answer = _answers.lookup(scope, query_vector)
+        if answer is not None:
+            return answer
         # Call Gemini model
         answer = call_gemini(question, context)
+        _answers.store(scope, query_vector, question, answer)
         return answer
 
-    return qa_function
+    def qa_stream(question: str):
+        scope, query_vector, context = _prepare_answer(db, question, index_dir)
+        answer = _answers.lookup(scope, query_vector)
+        if answer is not None:
+            yield answer
+            return
+        pieces = []
+        for piece in call_gemini_stream(question, context):
+            pieces.append(piece)
+            yield piece
+        # Only complete answers are cached
+        _answers.store(scope, query_vector, question, "".join(pieces))
+
+    return qa_stream if stream else qa_function
+
+
+class AsyncQASession:
+    """
+    asyncio-native QA over the index at `index_dir`, for one user session.
+    Retrieval (embedding + search, CPU-bound) runs in worker threads and
+    starts as soon as a question is asked or prefetched, so retrieval for
+    question N+1 overlaps generation for question N. Generation goes
+    through the async Gemini client, one question at a time and in order.
+    cancel() stops everything still in flight for the session.
+    """
+
+    def __init__(self, index_dir=VECTORSTORE_DIR):
+        self.index_dir = index_dir
+        self._prepared = OrderedDict()  # normalized question -> retrieval task, oldest first
+        self._tasks = set()
+        self._futures = set()
+        self._generation_lock = None  # created on the loop
+
+    # --- loop-side -------------------------------------------------------
+
+    async def _load(self):
+        db = await asyncio.to_thread(load_vectorstore, self.index_dir)
+        if db is None:
+            raise Exception("⚠️ No indexed papers found. Please upload and index PDFs first!")
+        return db
+
+    async def _prepare(self, question: str):
+        # -> (index version, prepared answer inputs)
+        db = await self._load()
+        return (db.path, db.version), await asyncio.to_thread(_prepare_answer, db, question, self.index_dir)
+
+    def _retrieval(self, question: str) -> asyncio.Task:
+        key = normalize_query(question)
+        task = self._prepared.get(key)
+        if task is None or task.cancelled():
+            task = asyncio.get_running_loop().create_task(self._prepare(question))
+            self._prepared[key] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # Unasked prefetches are dropped, not cancelled: a caller may be awaiting one
+            while len(self._prepared) > QA_PREFETCH_LIMIT:
+                self._prepared.popitem(last=False)
+        return task
+
+    async def _take(self, question: str):
+        version, prepared = await self._retrieval(question)
+        self._prepared.pop(normalize_query(question), None)
+        db = await self._load()
+        if (db.path, db.version) != version:
+            # Prefetched before the index was swapped: retrieve again from the new one
+            version, prepared = await self._prepare(question)
+        return prepared
+
+    async def answer(self, question: str) -> str:
+        self._retrieval(question)  # starts now, overlapping any answer still generating
+        if self._generation_lock is None:
+            self._generation_lock = asyncio.Lock()
+        async with self._generation_lock:
+            scope, query_vector, context = await self._take(question)
+            answer = _answers.lookup(scope, query_vector)
+            if answer is None:
+                answer = await call_gemini_async(question, context)
+                _answers.store(scope, query_vector, question, answer)
+            return answer
+
+    async def astream(self, question: str):
+        self._retrieval(question)  # starts now, overlapping any answer still generating
+        if self._generation_lock is None:
+            self._generation_lock = asyncio.Lock()
+        async with self._generation_lock:
+            scope, query_vector, context = await self._take(question)
+            answer = _answers.lookup(scope, query_vector)
+            if answer is not None:
+                yield answer
+                return
+            pieces = []
+            async for piece in call_gemini_astream(question, context):
+                pieces.append(piece)
+                yield piece
+            # Only complete answers are cached
+            _answers.store(scope, query_vector, question, "".join(pieces))
+
+    # --- caller-side (any thread) ----------------------------------------
+
+    def prefetch(self, questions):
+        """
+        Start retrieval for likely next questions (e.g. the suggestions).
+        """
+        async def start():
+            for question in questions:
+                self._retrieval(question)
+
+        submit(start())
+
+    def prepare(self, question: str):
+        """
+        Run (or join the prefetch of) retrieval for `question` and wait for
+        it, so a caller can show progress for retrieval alone; the next
+        ask()/stream() of the question reuses the result.
+        """
+        async def run():
+            await self._retrieval(question)
+
+        future = submit(run())
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return future.result()
+
+    def ask(self, question: str):
+        """
+        Answer `question` in the background; returns a concurrent Future.
+        """
+        future = submit(self.answer(question))
+        self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return future
+
+    def stream(self, question: str):
+        """
+        Plain generator of answer pieces (for st.write_stream); closing it
+        early cancels the request.
+        """
+        return iterate_sync(self.astream(question))
+
+    def cancel(self):
+        """
+        Cancel all in-flight retrievals and answers of this session.
+        """
+        for future in list(self._futures):
+            future.cancel()
+
+        def cancel_tasks():
+            for task in list(self._tasks):
+                task.cancel()
+            self._prepared.clear()
+
+        get_loop().call_soon_threadsafe(cancel_tasks)
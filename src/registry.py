@@ -0,0 +1,109 @@
+# registry.py
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.embedding_cache import get_embedding_cache
+from src.namespaces import resolve_index_dir
+from src.vector_index import VectorIndex, read_index_version
+
+_lock = threading.Lock()
+_embedders: Dict[str, object] = {}
+_embedder_locks: Dict[str, threading.Lock] = {}
+_warmup_threads: Dict[str, threading.Thread] = {}
+_indexes: Dict[str, Tuple[Tuple[str, int], VectorIndex]] = {}  # path -> ((version dir, version), loaded index)
+
+logger = logging.getLogger(__name__)
+
+
+def _load_embedder(model_name: str):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    embedder = HuggingFaceEmbeddings(model_name=model_name)
+    embedder.embed_query("warm up")  # forces the weights fully into memory
+    return embedder
+
+
+def get_embedder(model_name: str):
+    """
+    Process-wide embedder: sentence-transformers weights are loaded once.
+    If a warm-up is in flight, this waits for it rather than loading twice.
+    """
+    with _lock:
+        embedder = _embedders.get(model_name)
+        if embedder is not None:
+            return embedder
+        model_lock = _embedder_locks.setdefault(model_name, threading.Lock())
+
+    with model_lock:
+        embedder = _embedders.get(model_name)
+        if embedder is None:
+            embedder = _load_embedder(model_name)
+            with _lock:
+                _embedders[model_name] = embedder
+        return embedder
+
+
+def warm_up(model_name: str):
+    """
+    Start loading the embedder in a background thread (idempotent), so the
+    first search does not pay for the model load.
+    """
+    with _lock:
+        if model_name in _embedders or model_name in _warmup_threads:
+            return
+        thread = threading.Thread(target=_warm_up_safe, args=(model_name,), daemon=True, name=f"warmup-{model_name}")
+        _warmup_threads[model_name] = thread
+    thread.start()
+
+
+def _warm_up_safe(model_name: str):
+    try:
+        get_embedder(model_name)
+    except Exception as e:
+        logger.warning("Embedder warm-up failed: %s", e)
+    finally:
+        with _lock:
+            _warmup_threads.pop(model_name, None)
+
+
+def get_vector_index(path: str, model_name: str) -> Optional[VectorIndex]:
+    """
+    Loaded index for `path`, kept in memory across queries. It is only
+    re-read from disk when `path` points at a new index version.
+    """
+    # Resolve the version symlink once so all files come from the same version
+    version_dir = resolve_index_dir(path)
+    version = read_index_version(version_dir) if version_dir else None
+    if version is None:
+        return None
+
+    with _lock:
+        cached = _indexes.get(path)
+    if cached is not None and cached[0] == (version_dir, version):
+        return cached[1]
+
+    # Served indexes are never modified in place, so map them read-only
+    db = VectorIndex.load(version_dir, get_embedder(model_name), model_name, get_embedding_cache(model_name), mmap=True)
+    if db is not None:
+        with _lock:
+            _indexes[path] = ((version_dir, version), db)
+    return db
+
+
+def publish_vector_index(path: str, db: VectorIndex):
+    """
+    Register a freshly saved index so readers pick it up right away.
+    Readers get their own memory-mapped copy (cheap to open, pages shared
+    with other processes); the writer's private copy is not shared.
+    Readers holding the previous instance keep using it undisturbed.
+    """
+    served = VectorIndex.load(db.path, db.embedder, db.model_name, db.embedding_cache, mmap=True)
+    with _lock:
+        _indexes[path] = ((os.path.realpath(db.path), served.version), served)
+
+
+def invalidate(path: str):
+    with _lock:
+        _indexes.pop(path, None)
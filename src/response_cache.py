@@ -0,0 +1,150 @@
+# response_cache.py
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join("llm_cache", "responses.sqlite3"))
+DEFAULT_TTL = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+# Set LLM_CACHE_ENABLED=0 to always call the API
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False", "")
+# Expired entries are already misses; deleting them only needs to happen now and then
+PURGE_INTERVAL_SECONDS = float(os.getenv("LLM_CACHE_PURGE_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created);
+"""
+
+
+def _config_value(value):
+    # GenerationConfig and friends: compare by content, not identity
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def response_key(model: str, prompt: str, config: Optional[dict] = None) -> str:
+    """
+    Cache key for one call: SHA-256 over model, prompt and generation
+    config (sampling settings, safety settings, ...).
+    """
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "config": config or {}},
+        sort_keys=True, ensure_ascii=False, default=_config_value,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent LLM response cache in a single SQLite file, shared by every
+    process using the same path (WAL mode, so readers never block on a
+    writer). Entries older than `ttl` seconds are misses and are purged by
+    a write at most every PURGE_INTERVAL_SECONDS; beyond `max_bytes` of
+    response text the least recently used entries are dropped.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._next_purge = 0.0  # the first write purges
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT response FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                # A locked or damaged cache is just a cold cache
+                logger.warning("LLM response cache read failed: %s", e)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, model, response, size, now, now),
+                    )
+                    if now >= self._next_purge:
+                        self._db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl,))
+                        self._next_purge = now + PURGE_INTERVAL_SECONDS
+                    self._evict()
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                logger.warning("LLM response cache write failed: %s", e)
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until back under 90% of the cap
+        excess = total - int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
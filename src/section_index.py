@@ -0,0 +1,123 @@
+# section_index.py
+import re
+from collections import Counter
+
+# A line consisting only of an (optionally numbered) section heading,
+# or an inline "Abstract—..." / "Abstract:" lead-in
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:(?:\d+(?:\.\d+)*|[IVX]+)\.?[ \t]+)?"
+    r"(abstract|introduction|background|related work|methodology|materials and methods|methods?"
+    r"|experiments?|results|discussion|conclusions?|references|bibliography|acknowledge?ments?)"
+    r"[ \t]*(?::[ \t]*$|$|(?<=abstract)[ \t]*[.:—–-])",
+    re.IGNORECASE | re.MULTILINE,
+)
+SECTION_ALIASES = {
+    "method": "methods",
+    "methodology": "methods",
+    "materials and methods": "methods",
+    "experiment": "experiments",
+    "conclusions": "conclusion",
+    "bibliography": "references",
+    "acknowledgment": "acknowledgements",
+    "acknowledgement": "acknowledgements",
+    "acknowledgments": "acknowledgements",
+}
+
+# Sections every paper's table is expected to cover (when present)
+CORE_SECTIONS = ("abstract", "introduction", "methods", "results", "conclusion", "references")
+
+# A heading must be at least this much larger than body text unless bold
+HEADING_SIZE_RATIO = 1.05
+
+NUMBERED_HEADING = re.compile(r"^\s*(?:\d+(?:\.\d+)*|[IVX]+)\.?\s")
+
+
+def canonical_section(name):
+    name = name.lower()
+    return SECTION_ALIASES.get(name, name)
+
+
+def page_layout(page):
+    """
+    Reads a PyMuPDF page once via get_text("dict").
+    Returns (page_text, lines) where page_text matches get_text("text") and
+    each line is (offset_in_page, text, font_size, is_bold).
+    """
+    parts = []
+    lines = []
+    offset = 0
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:  # skip image blocks
+            continue
+        for line in block["lines"]:
+            spans = line["spans"]
+            line_text = "".join(span["text"] for span in spans)
+            size = max((span["size"] for span in spans), default=0.0)
+            bold = any(span["flags"] & 16 or "bold" in span["font"].lower() for span in spans if span["text"].strip())
+            lines.append((offset, line_text, size, bold, spans))
+            parts.append(line_text + "\n")
+            offset += len(line_text) + 1
+    return "".join(parts), lines
+
+
+class SectionSegmenter:
+    """
+    Single-pass section heading detector, fed one page at a time.
+    Headings are lines naming a known section that stand out from body text
+    by font size or weight (numbered or ALL-CAPS lines are accepted too, for
+    PDFs without usable font data). With `needed`, `done` turns true as soon
+    as those sections and the heading after each of them have been seen.
+    """
+
+    def __init__(self, needed=None):
+        self.needed = {canonical_section(n) for n in needed} if needed else None
+        self.offset = 0
+        self._size_chars = Counter()
+        self._headings = []  # (heading_start, body_start, name) in document offsets
+
+    def add_page(self, page):
+        """
+        Scan one page; returns its text so callers can assemble the document.
+        """
+        page_text, lines = page_layout(page)
+
+        for _, _, _, _, spans in lines:
+            for span in spans:
+                self._size_chars[round(span["size"], 1)] += len(span["text"].strip())
+        body_size = self._size_chars.most_common(1)[0][0] if self._size_chars else 0.0
+
+        for line_offset, line_text, size, bold, _ in lines:
+            match = SECTION_HEADING.match(line_text)
+            if not match:
+                continue
+            styled = bold or (body_size and size >= body_size * HEADING_SIZE_RATIO)
+            if styled or NUMBERED_HEADING.match(line_text) or line_text.strip().isupper():
+                start = self.offset + line_offset
+                self._headings.append((start, start + match.end(), canonical_section(match.group(1))))
+
+        self.offset += len(page_text)
+        return page_text
+
+    @property
+    def done(self):
+        if not self.needed:
+            return False
+        starts = {}
+        for start, _, name in self._headings:
+            starts.setdefault(name, start)
+        if not self.needed.issubset(starts):
+            return False
+        # Every needed section must also be closed by a later heading
+        return self._headings[-1][0] > max(starts[name] for name in self.needed)
+
+    def table(self):
+        """
+        Compact section table: {name: [start, end]} character offsets of each
+        section body (first occurrence wins), ending at the next heading.
+        """
+        table = {}
+        for i, (_, body_start, name) in enumerate(self._headings):
+            end = self._headings[i + 1][0] if i + 1 < len(self._headings) else self.offset
+            if name not in table:
+                table[name] = [body_start, end]
+        return table
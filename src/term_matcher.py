@@ -0,0 +1,125 @@
+# term_matcher.py
+import threading
+from typing import Any, Dict, Iterator, List, Tuple
+
+# Dashes, underscores and whitespace all match each other (and a line break
+# in extracted PDF text), so "ImageNet-1k" also finds "ImageNet 1k"
+_SEPARATORS = {ord(c): " " for c in "-_‐‑‒–—\t\n\r\f\v "}
+# Terms this short must match case exactly: "mAP" is not "map", "GLUE" not "glue"
+CASE_SENSITIVE_MAX_CHARS = 4
+
+
+def _fold_separators(text: str) -> str:
+    return text.translate(_SEPARATORS)
+
+
+def _fold(text: str) -> str:
+    """
+    Separator- and case-folded `text`, character for character the same
+    length, so match offsets index the original text.
+    """
+    folded = _fold_separators(text)
+    lowered = folded.lower()
+    if len(lowered) == len(folded):
+        return lowered
+    # A few characters lower-case to two ("İ"): leave those as they are
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in folded)
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over a set of terms: finds every occurrence of
+    all of them in one left-to-right pass over the text, however many
+    terms there are. Matching ignores case and treats dashes and whitespace
+    alike, except that terms of up to CASE_SENSITIVE_MAX_CHARS characters
+    must match case exactly. Matches must start and end on word boundaries.
+    """
+
+    def __init__(self):
+        self._terms: List[Tuple[str, Any, bool]] = []  # (term, value, case sensitive)
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._out: List[List[int]] = []  # state -> term ids ending there
+        self._built = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._terms)
+
+    def add(self, term: str, value: Any = None, case_sensitive: bool = None):
+        term = " ".join(_fold_separators(term).split())
+        if not term:
+            return
+        if case_sensitive is None:
+            case_sensitive = len(term) <= CASE_SENSITIVE_MAX_CHARS
+        with self._lock:
+            self._terms.append((term, term if value is None else value, case_sensitive))
+            self._built = False
+
+    def _build(self):
+        goto, out = [{}], [[]]
+        for term_id, (term, _, _) in enumerate(self._terms):
+            state = 0
+            for char in _fold(term):
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(term_id)
+
+        # Breadth first, so every state's failure target is already final
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                target = fail[state]
+                while target and char not in goto[target]:
+                    target = fail[target]
+                fail[nxt] = goto[target].get(char, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail, self._out = goto, fail, out
+        self._built = True
+
+    def _automaton(self):
+        with self._lock:
+            if not self._built:
+                self._build()
+            return self._goto, self._fail, self._out
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        Every (start, end, value) occurrence, overlapping ones included, in
+        order of their end offset.
+        """
+        goto, fail, out = self._automaton()
+        folded = _fold(text)
+        state = 0
+        for end, char in enumerate(folded, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for term_id in out[state]:
+                term, value, case_sensitive = self._terms[term_id]
+                start = end - len(term)
+                if (start > 0 and folded[start - 1].isalnum()) or (end < len(folded) and folded[end].isalnum()):
+                    continue
+                if case_sensitive and _fold_separators(text[start:end]) != term:
+                    continue
+                yield start, end, value
+
+    def find(self, text: str) -> List[Tuple[int, int, Any]]:
+        """
+        Non-overlapping matches, leftmost first and the longest term where
+        several start together ("MS COCO" over "COCO", "BLEU-4" over "BLEU").
+        """
+        matches = sorted(self.finditer(text), key=lambda match: (match[0], match[0] - match[1]))
+        kept, reached = [], 0
+        for start, end, value in matches:
+            if start >= reached:
+                kept.append((start, end, value))
+                reached = end
+        return kept
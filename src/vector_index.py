@@ -0,0 +1,463 @@
+# vector_index.py
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from src.bm25_index import BM25Index, reciprocal_rank_fusion
+from src.chunk_store import ChunkStore
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.json"  # pre-columnar format, still readable
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.npz"
+VERSION_FILE = "version"
+
+# Chunks embedded and added to FAISS per step while streaming a document
+EMBED_BATCH_SIZE = 256
+
+# Read-only loads map the FAISS file instead of copying it into memory
+# (IO_FLAG_MMAP_IFC also maps flat/HNSW vector storage, not just IVF lists)
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+# --- index backends ---------------------------------------------------------
+# Defaults come from benchmarks/ann_benchmark.py (recall@10 vs. latency on
+# 384-d MiniLM-sized vectors); see choose_index_kind for the policy.
+INDEX_KINDS = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+INDEX_KIND = os.getenv("VECTOR_INDEX_KIND", "auto")  # "auto" or one of INDEX_KINDS
+FLAT_MAX_CHUNKS = 50_000
+HNSW_MAX_CHUNKS = 1_000_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = int(os.getenv("VECTOR_INDEX_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("VECTOR_INDEX_NPROBE", "16"))
+IVF_PQ_M = 48  # max sub-quantizers: 384-d -> 48 bytes per vector
+TRAIN_SAMPLE = 100_000
+# IVF centroids are re-trained once the index outgrows its training set this much
+RETRAIN_GROWTH = 4
+# Tombstoned (removed but still indexed) vectors tolerated before a rebuild
+MAX_TOMBSTONE_RATIO = 0.25
+
+# --- retrieval --------------------------------------------------------------
+# "dense" (FAISS only), "hybrid" (FAISS + BM25, rank-fused), "prefilter"
+# (FAISS restricted to the BM25 candidates, then fused) or "auto": hybrid,
+# switching to prefilter once the corpus reaches PREFILTER_MIN_CHUNKS.
+RETRIEVAL_MODES = ("dense", "hybrid", "prefilter")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "auto")
+PREFILTER_MIN_CHUNKS = int(os.getenv("PREFILTER_MIN_CHUNKS", "200000"))
+PREFILTER_CANDIDATES = int(os.getenv("PREFILTER_CANDIDATES", "2000"))
+# Each leg returns this many times k results before fusion
+FUSION_DEPTH = 5
+RRF_K = 60
+
+
+def choose_index_kind(n_chunks: int) -> str:
+    """
+    Backend for a corpus of `n_chunks` chunks:
+    - flat (exact) up to 50k chunks: ~1-3 ms per query, perfect recall;
+    - hnsw up to 1M: sub-millisecond queries at ~0.98 recall@10, at the cost
+      of ~1.1x flat memory for the graph;
+    - ivf_pq beyond: ~50 bytes per chunk instead of 1.5 KB, so a multi-million
+      chunk library fits in RAM; recall@10 drops to ~0.8 (quantization
+      error, not nprobe, is the limit).
+    ivf_flat stays available via VECTOR_INDEX_KIND for exact-vector IVF.
+    """
+    if INDEX_KIND != "auto":
+        return INDEX_KIND
+    if n_chunks <= FLAT_MAX_CHUNKS:
+        return "flat"
+    if n_chunks <= HNSW_MAX_CHUNKS:
+        return "hnsw"
+    return "ivf_pq"
+
+
+def ivf_pq_subquantizers(dim: int) -> int:
+    """
+    Sub-quantizers for IVF-PQ on `dim`-d vectors: FAISS needs M to divide
+    dim, so the largest divisor of dim that is at most IVF_PQ_M.
+    """
+    return max(m for m in range(1, min(dim, IVF_PQ_M) + 1) if dim % m == 0)
+
+
+def build_faiss_index(kind: str, dim: int, train_vectors: Optional[np.ndarray] = None):
+    """
+    Create an empty id-addressable FAISS index of the given kind.
+    IVF kinds are trained on `train_vectors` (a sample of the corpus).
+    """
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(dim))
+    if kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, HNSW_M)
+        hnsw.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return faiss.IndexIDMap2(hnsw)
+    if kind in ("ivf_flat", "ivf_pq"):
+        n_train = len(train_vectors)
+        # ~4*sqrt(N) lists, with enough training points per centroid
+        nlist = max(1, min(int(4 * np.sqrt(n_train)), n_train // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, ivf_pq_subquantizers(dim), 8)
+        index.train(np.ascontiguousarray(train_vectors, dtype="float32"))
+        return index
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def set_search_params(index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    """
+    Apply query-time accuracy/speed knobs (nprobe for IVF, efSearch for HNSW).
+    """
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = ef_search
+    elif isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = nprobe
+
+
+def read_index_version(path: str) -> Optional[int]:
+    """
+    Version of the index saved at `path`, or None if there is none.
+    """
+    try:
+        with open(os.path.join(path, VERSION_FILE), "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+class VectorIndex:
+    """
+    Incremental FAISS vector store tracked by document content hash.
+    Vectors live in an IndexIDMap2 so a document's chunks can be added and
+    removed by id without touching anything else; the manifest records
+    which ids belong to which document and is persisted with the index.
+    """
+
+    def __init__(self, path: str, embedder, model_name: str = "", embedding_cache=None):
+        self.path = path
+        self.embedder = embedder
+        self.model_name = model_name
+        self.embedding_cache = embedding_cache
+        self.index = None  # created on first add, once the dimension is known
+        self.chunks = ChunkStore()  # chunk id -> (text, metadata)
+        self.documents: Dict[str, dict] = {}  # doc hash -> {"source", "ids"}
+        self.next_id = 0
+        self.version = 0
+        self.ingest_stats = None  # throughput of the last ingest, if any
+        self.index_kind = "flat"
+        self.trained_on = 0  # corpus size IVF centroids were trained on
+        self.lexical = BM25Index()
+        self.read_only = False
+
+    # --- persistence -----------------------------------------------------
+
+    @classmethod
+    def load(
+        cls, path: str, embedder, model_name: str = "", embedding_cache=None, mmap: bool = False
+    ) -> Optional["VectorIndex"]:
+        """
+        Load a saved index, or return None if there is none (or it was built
+        with a different embedding model). Chunks are always memory-mapped;
+        with `mmap` the FAISS index is too, which makes loading near-instant
+        and lets processes share pages, but the index is then read-only.
+        """
+        manifest_path = os.path.join(path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if model_name and manifest.get("model") != model_name:
+            return None
+
+        db = cls(path, embedder, model_name, embedding_cache)
+        db.documents = manifest["documents"]
+        db.next_id = manifest["next_id"]
+        db.version = manifest["version"]
+        db.index_kind = manifest.get("index_kind", "flat")
+        db.trained_on = manifest.get("trained_on", 0)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            db.index = faiss.read_index(index_path, MMAP_FLAGS if mmap else 0)
+            set_search_params(db.index)
+        db.read_only = mmap
+        if ChunkStore.exists(path):
+            db.chunks = ChunkStore.load(path)
+        else:
+            with open(os.path.join(path, CHUNKS_FILE), "r", encoding="utf-8") as f:
+                for chunk_id, (text, meta) in json.load(f).items():
+                    db.chunks[int(chunk_id)] = (text, meta)
+        bm25_path = os.path.join(path, BM25_FILE)
+        # Indexes saved before the lexical index existed get one built from their chunks
+        db.lexical = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else BM25Index.from_chunks(db.chunks)
+        return db
+
+    def save(self):
+        """
+        Persist index, chunk texts and manifest; bumps the index version.
+        The manifest is written last so it only ever describes complete files.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self.version += 1
+
+        if self.index is not None:
+            faiss.write_index(self.index, self._tmp(INDEX_FILE))
+            os.replace(self._tmp(INDEX_FILE), os.path.join(self.path, INDEX_FILE))
+
+        self.chunks.save(self.path)
+        if os.path.exists(os.path.join(self.path, CHUNKS_FILE)):
+            os.remove(os.path.join(self.path, CHUNKS_FILE))
+
+        self.lexical.save(self._tmp(BM25_FILE))
+        os.replace(self._tmp(BM25_FILE), os.path.join(self.path, BM25_FILE))
+
+        manifest = {
+            "version": self.version,
+            "model": self.model_name,
+            "next_id": self.next_id,
+            "index_kind": self.index_kind,
+            "trained_on": self.trained_on,
+            "documents": self.documents,
+        }
+        with open(self._tmp(MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self._tmp(MANIFEST_FILE), os.path.join(self.path, MANIFEST_FILE))
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+
+        # Tiny file readers poll to decide whether their in-memory copy is stale
+        with open(self._tmp(VERSION_FILE), "w", encoding="utf-8") as f:
+            f.write(str(self.version))
+        os.replace(self._tmp(VERSION_FILE), os.path.join(self.path, VERSION_FILE))
+
+        # Swap the in-memory overlay for a mapping of what was just written
+        self.chunks = ChunkStore.load(self.path)
+
+    def _tmp(self, name):
+        return os.path.join(self.path, f".{name}.tmp")
+
+    # --- updates ---------------------------------------------------------
+
+    def _check_writable(self):
+        if self.read_only:
+            raise RuntimeError("Index was loaded memory-mapped (read-only); load it with mmap=False to update it")
+
+    def has_document(self, doc_hash: str) -> bool:
+        return doc_hash in self.documents
+
+    def add_document(self, doc_hash: str, source: str, chunks: Iterable[Tuple[str, dict]]) -> int:
+        """
+        Embed and add one document's (text, metadata) chunks in batches.
+        Returns the number of chunks added.
+        """
+        self._check_writable()
+        if doc_hash in self.documents:
+            self.remove_document(doc_hash)
+
+        added = 0
+        batch = []
+        for text, metadata in chunks:
+            batch.append((text, metadata))
+            if len(batch) >= EMBED_BATCH_SIZE:
+                added += self.add_embedded_chunks(doc_hash, source, batch, self.embed_texts([t for t, _ in batch]))
+                batch = []
+        if batch:
+            added += self.add_embedded_chunks(doc_hash, source, batch, self.embed_texts([t for t, _ in batch]))
+
+        self.documents.setdefault(doc_hash, {"source": source, "ids": []})
+        return added
+
+    def add_embedded_chunks(self, doc_hash: str, source: str, batch: List[Tuple[str, dict]], vectors: np.ndarray) -> int:
+        """
+        Append already-embedded (text, metadata) chunks to a document.
+        """
+        self._check_writable()
+        if self.index is None:
+            # Start exact; rebuild_if_needed() moves to an ANN backend as the corpus grows
+            self.index = build_faiss_index("flat", vectors.shape[1])
+            self.index_kind = "flat"
+
+        ids = list(range(self.next_id, self.next_id + len(batch)))
+        self.next_id += len(batch)
+        self.index.add_with_ids(np.asarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64"))
+        for chunk_id, (text, metadata) in zip(ids, batch):
+            self.chunks[chunk_id] = (text, {**metadata, "source": source, "chunk_id": chunk_id})
+            self.lexical.add(chunk_id, text)
+
+        entry = self.documents.setdefault(doc_hash, {"source": source, "ids": []})
+        entry["ids"].extend(ids)
+        return len(ids)
+
+    def embed_texts(self, texts: List[str], encoder=None) -> np.ndarray:
+        """
+        Embed chunk texts with `encoder` (default: this index's embedder).
+        With an embedding cache, only never-seen chunks reach the encoder.
+        """
+        embed_fn = (encoder or self.embedder).embed_documents
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed_documents(texts, embed_fn)
+        return np.asarray(embed_fn(texts), dtype="float32")
+
+    def remove_document(self, doc_hash: str) -> int:
+        """
+        Drop one document's vectors and chunks. Returns the number removed.
+        """
+        self._check_writable()
+        entry = self.documents.pop(doc_hash, None)
+        if not entry or not entry["ids"]:
+            return 0
+        if self.index_kind != "hnsw":
+            self.index.remove_ids(np.asarray(entry["ids"], dtype="int64"))
+        # HNSW graphs cannot drop nodes: ids just disappear from `chunks` and are
+        # filtered out at search time until rebuild_if_needed() compacts them
+        for chunk_id in entry["ids"]:
+            self.chunks.pop(chunk_id, None)
+        self.lexical.remove(entry["ids"])
+        return len(entry["ids"])
+
+    def rename_document(self, doc_hash: str, source: str):
+        """
+        Same content uploaded under a new file name: update metadata only.
+        """
+        self._check_writable()
+        entry = self.documents[doc_hash]
+        entry["source"] = source
+        for chunk_id in entry["ids"]:
+            text, metadata = self.chunks[chunk_id]
+            self.chunks[chunk_id] = (text, {**metadata, "source": source})
+
+    # --- backend selection -------------------------------------------------
+
+    def rebuild_if_needed(self) -> bool:
+        """
+        Switch backend when the corpus size calls for a different kind, when
+        IVF centroids were trained on a much smaller corpus, or when too many
+        tombstones have piled up. Returns True if the index was rebuilt.
+        """
+        if self.index is None or not self.chunks:
+            return False
+        kind = choose_index_kind(len(self.chunks))
+        stale_training = kind.startswith("ivf") and len(self.chunks) > RETRAIN_GROWTH * max(self.trained_on, 1)
+        tombstones = self.index.ntotal - len(self.chunks)
+        if kind == self.index_kind and not stale_training and tombstones <= MAX_TOMBSTONE_RATIO * self.index.ntotal:
+            return False
+        self.rebuild(kind)
+        return True
+
+    def rebuild(self, kind: str):
+        """
+        Re-create the FAISS index as `kind` from the current chunks. Vectors
+        come from the embedding cache, so this rarely re-runs the model.
+        """
+        self._check_writable()
+        ids = np.fromiter(self.chunks.keys(), dtype="int64", count=len(self.chunks))
+        vectors = np.concatenate([
+            self.embed_texts([self.chunks[int(chunk_id)][0] for chunk_id in ids[i:i + EMBED_BATCH_SIZE]])
+            for i in range(0, len(ids), EMBED_BATCH_SIZE)
+        ])
+
+        train = None
+        if kind.startswith("ivf"):
+            rng = np.random.default_rng(0)
+            sample = rng.choice(len(vectors), size=min(TRAIN_SAMPLE, len(vectors)), replace=False)
+            train = vectors[sample]
+
+        index = build_faiss_index(kind, vectors.shape[1], train)
+        index.add_with_ids(vectors, ids)
+        set_search_params(index)
+        self.index = index
+        self.index_kind = kind
+        self.trained_on = len(ids) if train is not None else 0
+
+    # --- search ----------------------------------------------------------
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        mode: str = RETRIEVAL_MODE,
+        filters: Optional[Dict[str, object]] = None,
+        query_vector: Optional[np.ndarray] = None,
+    ) -> List[Document]:
+        """
+        Top `k` chunks for `query` as Documents. `mode` is one of
+        RETRIEVAL_MODES or "auto" (see RETRIEVAL_MODE); `filters` keeps only
+        chunks whose metadata matches every {key: value}. Pass `query_vector`
+        to skip embedding the query again.
+        """
+        if self.index is None or not self.chunks:
+            return []
+        if mode == "auto":
+            mode = "prefilter" if len(self.chunks) >= PREFILTER_MIN_CHUNKS else "hybrid"
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+
+        if query_vector is None:
+            query_vector = self.embedder.embed_query(query)
+        query_vector = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+
+        allowed = None
+        if filters:
+            allowed = self.chunks.ids_where(filters)
+            if not allowed:
+                return []
+
+        depth = k * FUSION_DEPTH
+        if mode == "dense":
+            return self._documents(self.dense_search(query_vector, k, candidates=allowed), k)
+
+        if allowed is not None:
+            # Rank every lexical match, then keep the allowed ones
+            allowed_set = set(allowed)
+            ranked = self.lexical.search(query, len(self.chunks))
+            lexical_ids = [chunk_id for chunk_id, _ in ranked if chunk_id in allowed_set][:depth]
+            dense_ids = self.dense_search(query_vector, depth, candidates=allowed)
+        else:
+            n_lexical = max(depth, PREFILTER_CANDIDATES) if mode == "prefilter" else depth
+            lexical_ids = [chunk_id for chunk_id, _ in self.lexical.search(query, n_lexical)]
+            if mode == "prefilter" and len(lexical_ids) >= depth:
+                dense_ids = self.dense_search(query_vector, depth, candidates=lexical_ids)
+            else:
+                # Too few lexical matches to narrow the search safely: search everything
+                dense_ids = self.dense_search(query_vector, depth)
+        fused = reciprocal_rank_fusion([dense_ids, lexical_ids[:depth]], RRF_K)
+        return self._documents(fused, k)
+
+    def dense_search(self, query_vector: np.ndarray, k: int, candidates: Optional[List[int]] = None) -> List[int]:
+        """
+        Chunk ids nearest to `query_vector`, optionally only among `candidates`.
+        """
+        if candidates is None:
+            # Over-fetch by the number of tombstones so k live results remain
+            tombstones = self.index.ntotal - len(self.chunks)
+            _, ids = self.index.search(query_vector, min(k + tombstones, self.index.ntotal))
+            return [int(chunk_id) for chunk_id in ids[0] if int(chunk_id) in self.chunks][:k]
+
+        candidates = np.asarray([c for c in candidates if c in self.chunks], dtype="int64")
+        if isinstance(self.index, faiss.IndexIDMap2):
+            # flat/hnsw keep full vectors: score the few candidates exactly
+            vectors = self.index.reconstruct_batch(candidates)
+            distances = ((vectors - query_vector) ** 2).sum(axis=1)
+            return [int(c) for c in candidates[np.argsort(distances, kind="stable")[:k]]]
+        # IVF: let FAISS skip everything outside the candidate set
+        params = faiss.SearchParametersIVF(sel=faiss.IDSelectorBatch(candidates), nprobe=self.index.nprobe)
+        _, ids = self.index.search(query_vector, min(k, len(candidates)), params=params)
+        return [int(chunk_id) for chunk_id in ids[0] if chunk_id != -1]
+
+    def _documents(self, chunk_ids: Iterable[int], k: int) -> List[Document]:
+        docs = []
+        for chunk_id in chunk_ids:
+            chunk = self.chunks.get(chunk_id)
+            if chunk is None:  # a removed chunk
+                continue
+            docs.append(Document(page_content=chunk[0], metadata=chunk[1]))
+            if len(docs) == k:
+                break
+        return docs
@@ -0,0 +1,30 @@
+from src.dataset_metric_extractor import extract_datasets_and_metrics_with_gemini
+
+
+def _fast(text):
+    extraction = extract_datasets_and_metrics_with_gemini(text, mode="fast")
+    return [d.name for d in extraction.datasets], [m.name for m in extraction.metrics]
+
+
+def test_fast_mode_ignores_lowercase_prose():
+    text = (
+        "we recall that animals mimic the kinetics of their prey, and the pile of common crawl "
+        "notes from the atari era sits on a map next to the glue. latency and throughput matter "
+        "for the precision of the natural questions we ask, and open images of cityscapes "
+        "show the kinetics of common voice recordings and their accuracy in general terms. "
+    ) * 3
+
+    assert _fast(text) == ([], [])
+
+
+def test_fast_mode_finds_names_as_papers_write_them():
+    text = (
+        "We pretrain on The Pile and Common Crawl, then evaluate on MIMIC-III, Kinetics-400 and "
+        "imagenet-1k (a lower-cased spelling). The model reaches 81.2% accuracy and a BLEU-4 of "
+        "31.5 on WMT14. We recall that prior work did not report F1. "
+    ) * 3
+
+    datasets, metrics = _fast(text)
+
+    assert datasets == ["The Pile", "Common Crawl", "MIMIC-III", "Kinetics-400", "ImageNet", "WMT"]
+    assert metrics == ["Accuracy", "BLEU", "F1"]
@@ -0,0 +1,79 @@
+import numpy as np
+
+from src import embedding_cache
+from src.embedding_cache import EmbeddingCache
+from src.ingest import ingest_documents
+
+
+class FakeIndex:
+    """
+    The parts of VectorIndex that ingest_documents() uses, embedding
+    through `embedding_cache` like the real one.
+    """
+
+    def __init__(self, cache):
+        self.embedding_cache = cache
+        self.documents = {}
+
+    def embed_texts(self, texts, encoder=None):
+        return self.embedding_cache.embed_documents(
+            texts, lambda batch: [[float(len(text)), 1.0, 0.0, 0.0] for text in batch]
+        )
+
+    def add_embedded_chunks(self, doc_hash, source, batch, vectors):
+        self.documents.setdefault(doc_hash, {"source": source, "ids": []})["ids"].extend(range(len(batch)))
+        return len(batch)
+
+    def remove_document(self, doc_hash):
+        return len(self.documents.pop(doc_hash, {"ids": []})["ids"])
+
+
+def _count_index_writes(monkeypatch, cache):
+    writes = []
+    original = cache._write_index
+    monkeypatch.setattr(cache, "_write_index", lambda: (writes.append(1), original())[1])
+    return writes
+
+
+def _documents(n_docs, chunks_per_doc):
+    return [
+        (f"doc{d}", f"doc{d}.pdf", [(f"doc {d} chunk {c}", {}) for c in range(chunks_per_doc)])
+        for d in range(n_docs)
+    ]
+
+
+def test_ingest_flushes_slot_index_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "FLUSH_INTERVAL_SECONDS", 3600)
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    writes = _count_index_writes(monkeypatch, cache)
+
+    stats = ingest_documents(FakeIndex(cache), _documents(5, 40), batch_size=8)
+
+    assert stats["chunks"] == 200
+    assert cache.stats()["entries"] == 200
+    assert len(writes) == 1
+
+
+def test_flush_without_new_entries_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "FLUSH_INTERVAL_SECONDS", 3600)
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    ingest_documents(FakeIndex(cache), _documents(2, 10), batch_size=4)
+    writes = _count_index_writes(monkeypatch, cache)
+
+    # Everything is cached now: a second ingest adds nothing to persist
+    ingest_documents(FakeIndex(cache), _documents(2, 10), batch_size=4)
+
+    assert writes == []
+    assert cache.stats()["hits"] == 20
+
+
+def test_flushed_entries_survive_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "FLUSH_INTERVAL_SECONDS", 3600)
+    cache = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    ingest_documents(FakeIndex(cache), _documents(1, 12), batch_size=5)
+
+    reloaded = EmbeddingCache("test-model", cache_dir=str(tmp_path))
+    vectors = reloaded.get_many([embedding_cache.hash_chunk("doc 0 chunk 3")])
+
+    assert reloaded.stats()["entries"] == 12
+    np.testing.assert_array_equal(next(iter(vectors.values())), [len("doc 0 chunk 3"), 1.0, 0.0, 0.0])
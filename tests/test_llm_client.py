@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from src.llm_backends import LLMTimeoutError, StubBackend
+from src.llm_client import EXPECTED_OUTPUT_TOKENS, LLMClient
+
+
+def _client(**stub):
+    stub = {"latency_ms": 1, "tokens_per_second": 1e6, "output_tokens": 50, "max_concurrency": 0, **stub}
+    return LLMClient(backend=StubBackend(**stub), cache=False)
+
+
+def test_stream_settles_token_reservation():
+    client = _client()
+    prompt = "hello " * 100
+    text = "".join(client.stream(prompt))
+    # Only the streamed tokens stay reserved, not EXPECTED_OUTPUT_TOKENS
+    spent = client.tokens.capacity - client.tokens.tokens
+    expected = client.estimator.count(prompt, "stub-default") + client.estimator.count(text, "stub-default")
+    assert spent < expected + EXPECTED_OUTPUT_TOKENS / 2
+
+
+def test_astream_settles_token_reservation():
+    client = _client()
+
+    async def consume():
+        return "".join([piece async for piece in client.astream("hi " * 100)])
+
+    asyncio.run(consume())
+    assert client.tokens.capacity - client.tokens.tokens < EXPECTED_OUTPUT_TOKENS
+
+
+def test_zero_retries_makes_a_single_attempt():
+    client = _client(failure_rate=1.0, failure_kind="timeout")
+    with pytest.raises(LLMTimeoutError):
+        client.generate("x", max_retries=0)
+    assert client.backend.calls == 1
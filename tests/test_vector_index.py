@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from src.vector_index import build_faiss_index, ivf_pq_subquantizers
+
+
+@pytest.mark.parametrize("dim, m", [(384, 48), (768, 48), (100, 25), (16, 16), (7, 7)])
+def test_subquantizers_divide_dim(dim, m):
+    assert ivf_pq_subquantizers(dim) == m
+
+
+def test_ivf_pq_builds_at_small_dimension():
+    vectors = np.random.default_rng(0).standard_normal((2000, 16)).astype("float32")
+    index = build_faiss_index("ivf_pq", 16, vectors)
+    index.add(vectors)
+    _, ids = index.search(vectors[:5], 1)
+    assert index.ntotal == 2000
+    assert ids.shape == (5, 1)